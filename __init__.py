@@ -1,4 +1,6 @@
+import os
 import gdsfactory as gf
+import numpy as np
 from gdsfactory.technology import LayerMap
 from gdsfactory.typings import Layer
 
@@ -23,6 +25,22 @@ class Settings:
     DEFAULT_TEXT_SIZE = 50
     DEFAULT_DXDY = 30
     DEFAULT_GRATING_DIST = 250
+    # klayout tiling processor settings for die-scale Region operations
+    DEFAULT_TILE_SIZE = 1000 # um
+    DEFAULT_THREADS = os.cpu_count()
+    # sheet resistances (ohm/square) for heater/routing resistance extraction
+    DEFAULT_HEATER_SHEET_RES = 7e0 # ~100 nm TiW
+    DEFAULT_ROUTING_SHEET_RES = 6e-2 # TiW/Al bilayer, dominated by the Al
+    # e-beam write time estimates
+    DEFAULT_BEAM_CURRENT = 10e0 # nA
+    DEFAULT_EBEAM_DOSE = 1000e0 # uC/cm^2, HSQ
+    DEFAULT_FIELD_SIZE = 500e0 # um, main deflection field
+    DEFAULT_MAX_SHOT_SIZE = 1e0 # um, largest trapezoid written as one shot
+    DEFAULT_SHOT_TIME = 1e-7 # s, settling/blanking overhead per shot
+    DEFAULT_FIELD_TIME = 0.1e0 # s, stage move and settling per field
+    # largest allowed deviation (um) between a curve and its polygon edges, sets the
+    # point count of every curved generator. None falls back to gdsfactory's defaults
+    DEFAULT_MAX_SAGITTA = 1e-3
 
 class LayerMapUNO:#(LayerMap):
     def __new__(cls):
@@ -66,11 +84,72 @@ def waveguide_xs(width=None, layer=None, radius=None):
 
 
 
+def layer_index(layer, componentIn=None):
+    # layout index of a (layer, datatype) tuple, for working on klayout
+    # Regions/Shapes directly instead of through gdsfactory
+    kcl = gf.kcl if componentIn is None else componentIn.kcl
+    return kcl.layout.layer(*layer)
+
+
+def _max_sagitta(tolerance):
+    return Settings.DEFAULT_MAX_SAGITTA if tolerance is None else tolerance
+
+def _arc_segments(radius, angle, tolerance):
+    # chords needed for an arc of radius (um) over angle (degrees) to stay within
+    # tolerance of it, and never more than 90 degrees per chord
+    step = np.degrees(2*np.arccos(max(1e0 - tolerance/radius, -1e0)))
+    return max(int(np.ceil(abs(angle)/step)), int(np.ceil(abs(angle)/90)), 1)
+
+def arc_npoints(radius, angle, width = 0e0, tolerance = None):
+    # npoints kwarg (points over the whole arc) for gf.components.bend_circular and
+    # gf.path.arc, so the outer edge of a waveguide of width stays within tolerance.
+    # {} if there is no tolerance, i.e. gdsfactory's default
+    tolerance = _max_sagitta(tolerance)
+    if tolerance is None:
+        return {}
+    return {"npoints": _arc_segments(radius + width/2, angle, tolerance) + 1}
+
+def euler_npoints(radius, angle, p = 0.5, useEff = True, width = 0e0, tolerance = None):
+    # npoints kwarg for gf.components.bend_euler (with_arc_floorplan = useEff) and
+    # gf.path.euler. gdsfactory spreads npoints evenly along each half of the bend, so
+    # the spacing is set by the bend's minimum radius
+    tolerance = _max_sagitta(tolerance)
+    if tolerance is None:
+        return {}
+    path = gf.path.euler(radius = radius, angle = angle, p = p, use_eff = useEff, npoints = 64)
+    rMin = path.info["Rmin"]
+    step = rMin*2*np.arccos(max(1e0 - tolerance/(rMin + width/2), -1e0))
+    return {"npoints": max(int(np.ceil(path.length()/2/step)), 2) + 1}
+
+def bend_s_npoints(size, width = 0e0, tolerance = None):
+    # npoints kwarg for gf.components.bend_s, whose bezier points are evenly spaced in t:
+    # a chord of length speed*dt at curvature k has sagitta (speed*dt)^2*k/8,
+    # times (1 + width*k/2) on the outer edge
+    tolerance = _max_sagitta(tolerance)
+    if tolerance is None or size[1] == 0:
+        return {}
+    dx, dy = size
+    t = np.linspace(0e0, 1e0, 201)
+    d1 = np.stack((3*dx/4*(1 + (1 - 2*t)**2), 6*dy*t*(1 - t)), axis = -1)
+    d2 = np.stack((-3*dx*(1 - 2*t), 6*dy*(1 - 2*t)), axis = -1)
+    speed = np.linalg.norm(d1, axis = -1)
+    curvature = np.abs(d1[:, 0]*d2[:, 1] - d1[:, 1]*d2[:, 0])/np.maximum(speed, 1e-12)**3
+    sagittaPerDt2 = speed**2*curvature*(1 + width*curvature/2)/8
+    return {"npoints": max(int(np.ceil(np.sqrt(sagittaPerDt2.max()/tolerance))), 2) + 1}
+
+def circle_resolution(radius, tolerance = None):
+    # angle_resolution kwarg (degrees per point) for gf.components.circle
+    tolerance = _max_sagitta(tolerance)
+    if tolerance is None:
+        return {}
+    return {"angle_resolution": 360/_arc_segments(radius, 360, tolerance)}
+
+
 def routing_xs(rtWidth = Settings.DEFAULT_ROUTE_WIDTH):
     # default if passed None:
     rtWidth = Settings.DEFAULT_ROUTE_WIDTH if rtWidth is None else rtWidth
     return gf.cross_section.cross_section(width = rtWidth, 
-                                   layer = Settings.LAYERS.ROUTING,
+                                   layer = LayerMapUNO.ROUTING,
                                    port_names=('e0', 'e1'),
                                    port_types=('electrical', 'electrical'))
 
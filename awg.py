@@ -2,7 +2,7 @@
 
 
 import gdsfactory as gf
-from uno_layout import Settings, LayerMapUNO, waveguide_xs
+from uno_layout import Settings, LayerMapUNO, waveguide_xs, arc_npoints
 import uno_layout.components_wg as uno_wg
 import numpy as np
 import math
@@ -21,7 +21,7 @@ def rowland_fsp(r_a:float = 50, y_span:float = 25,
                 n_array = 9, d_array = 2, # 'a' subscripts in paper
                 input_wg_length = 20, output_wg_length = 50, # length of waveguides coming out of this component
                 #desired_port_sep = 5, # instead of doing input and output lengths, 
-                xs = waveguide_xs(), n_curve = 64,
+                xs = waveguide_xs(), n_curve = None, # points per curve, from Settings.DEFAULT_MAX_SAGITTA if None
                 ports_inside_arc: float = 0.05 # offset port placements to ensure waveguide overlap with slab
                 ):
     # free space propagation region following Rowland circle
@@ -45,11 +45,16 @@ def rowland_fsp(r_a:float = 50, y_span:float = 25,
     
     
     input_angle_span = math.asin(y_span/r_a)
-    input_angles = np.linspace(input_angle_span, -input_angle_span, n_curve)
+    output_angle_span = math.asin(0.5*y_span/r_a)
+    if n_curve is None:
+        n_input = arc_npoints(r_a/2, math.degrees(2*input_angle_span)).get("npoints", 64)
+        n_output = arc_npoints(r_a, math.degrees(2*output_angle_span)).get("npoints", 64)
+    else:
+        n_input = n_output = n_curve
+    input_angles = np.linspace(input_angle_span, -input_angle_span, n_input)
     input_arc = [io_curve(i, 0) for i in input_angles]
 
-    output_angle_span = math.asin(0.5*y_span/r_a)
-    output_angles = np.linspace(-output_angle_span, output_angle_span, n_curve)
+    output_angles = np.linspace(-output_angle_span, output_angle_span, n_output)
     output_arc = [array_curve(i, 0) for i in output_angles]
 
     full_shape = input_arc + output_arc;
@@ -204,10 +209,12 @@ def fancy_awg_bend(d, phi_deg, L_desired, xs = waveguide_xs(), wg_idx = None):
         
     # generate path all at once and avoid non-manhattan connection nightmare
     p = (gf.path.straight(s) 
-        + gf.path.arc(radius = radius, angle = -2*phi_deg)
+        + gf.path.arc(radius = radius, angle = -2*phi_deg, **arc_npoints(radius, -2*phi_deg, xs.width))
         + gf.path.straight(s))
     print(p.length())
-    return gf.path.extrude(p, xs)
+    c = gf.path.extrude(p, xs)
+    c.info["length"] = p.length()
+    return c
     
     
     
\ No newline at end of file
@@ -1,8 +1,9 @@
 import gdsfactory as gf
-from uno_layout import Settings, LayerMapUNO, waveguide_xs
+from uno_layout import Settings, LayerMapUNO, waveguide_xs, euler_npoints, bend_s_npoints
 import uno_layout.components_wg as uno_wg
 import numpy as np
 import uno_layout.tools as uno_tools
+from uno_layout.tools import dp2tuple
 LAYERS = LayerMapUNO
 DEFAULT_WG_WIDTH = Settings.DEFAULT_WG_WIDTH
 DEFAULT_RADIUS = Settings.DEFAULT_RADIUS
@@ -31,7 +32,8 @@ def dirPolSplitter(xsIn, gapIn = 450, lengthIn = 15000, numStages = 3000,
     lastTM = c1.ports[tmPort]
     # place taper + bend on unused input/outputs to reduce leakage and reflections
     bendRadius = 5000
-    thisBend = gf.components.bend_euler(radius = bendRadius, cross_section = xsIn, angle = -90)
+    thisBend = gf.components.bend_euler(radius = bendRadius, cross_section = xsIn, angle = -90,
+                                        **euler_npoints(bendRadius, -90, width = gf.get_cross_section(xsIn).width))
     tipWidth = 100
     thisTaper = gf.components.taper_cross_section(
         cross_section1 = xsIn,
@@ -118,12 +120,17 @@ def gen_racetrack(numCouplers, # must be 1 or 2
     s2.connect('o1', c1.ports['o0'])
 
     # create most basic unit of the ring manually for APPROX length
-    ringBend = gf.path.euler(radius = eulerRadius, angle = -180)
+    ringBend = gf.path.euler(radius = eulerRadius, angle = -180,
+                             **euler_npoints(eulerRadius, -180, useEff = False, width = crossSection.width))
     totStraightLength = ringLength - 2*ringBend.length() - 2*couplingLength - 4*couplerDy
     ringPathStraight = gf.path.straight(length = totStraightLength/4)
     baseRingPath = ringPathStraight + ringBend + ringPathStraight
-    p1 = c << gf.path.extrude(baseRingPath, cross_section = crossSection)
-    p2 = c << gf.path.extrude(baseRingPath.dmirror(), cross_section = crossSection)
+    ringArm1 = gf.path.extrude(baseRingPath, cross_section = crossSection)
+    ringArm2 = gf.path.extrude(baseRingPath.dmirror(), cross_section = crossSection)
+    # so length extraction (uno_layout.extraction) can follow the ring
+    ringArm1.info["length"] = ringArm2.info["length"] = baseRingPath.length()
+    p1 = c << ringArm1
+    p2 = c << ringArm2
     p1.dmirror_x() 
     p2.dmirror_x() # I dare you to try and change/simplify the double mirror on p2
 
@@ -248,8 +255,9 @@ def gen_coupler_racetrack_2ports(wgWidth = 0.5, eulerRadius = 10,
     c2 = c << uno_wg.asymmetric_coupler(wgWidth=wgWidth, couplingLength=couplingLength2, couplerDx=couplerDx2,
                                      couplerDy=couplerDy2, couplerGap = couplerGap2, busLen = straightLen, crossSection=crossSection)
     c2.mirror_y()
-    p1 = c << gf.components.bend_euler(radius=eulerRadius, angle=-180, cross_section=crossSection,with_arc_floorplan=use_effective_radius)
-    p2 = c << gf.components.bend_euler(radius=eulerRadius, angle=-180, cross_section=crossSection,with_arc_floorplan=use_effective_radius)
+    bendPoints = euler_npoints(eulerRadius, -180, useEff = use_effective_radius, width = crossSection.width)
+    p1 = c << gf.components.bend_euler(radius=eulerRadius, angle=-180, cross_section=crossSection,with_arc_floorplan=use_effective_radius, **bendPoints)
+    p2 = c << gf.components.bend_euler(radius=eulerRadius, angle=-180, cross_section=crossSection,with_arc_floorplan=use_effective_radius, **bendPoints)
     p2.mirror_x()
     p1.connect("o1", c1.ports["o4"])
     c2.connect("o4", p1.ports["o2"])
@@ -264,11 +272,11 @@ def gen_coupler_racetrack_2ports(wgWidth = 0.5, eulerRadius = 10,
     c.add_port(port=c1.ports["o3"],name="o3")
     c.add_port(port=c2.ports["o1"],name="o2")
     c.add_port(port=c2.ports["o3"],name="o1")
-    c << gf.components.text(text = f"{temp_length:.2f}um", 
-                    layer = LAYERS.ANNOTATION,
-                    position = ((c.ports["o1"].dx+c.ports["o2"].dx)/2, c.ports["o1"].dy - 50),
-                    justify = "center",
-                    size = 25)
+    uno_wg.add_label(c, f"{temp_length:.2f}um", 
+                     layer = LAYERS.ANNOTATION,
+                     position = ((c.ports["o1"].dx+c.ports["o2"].dx)/2, c.ports["o1"].dy - 50),
+                     justify = "center",
+                     size = 25)
 
 
     c.info["Ring length"] = temp_length
@@ -315,7 +323,7 @@ def ring_with_grating_couplers(ring: gf.Component | gf.ComponentReference | dict
     c.info["measurement"] = "ring"
     
     if Label is not None:
-        t = c << gf.components.text(Label,size=30,position=(Settings.DEFAULT_GRATING_DIST*1.5,50+r.ports["o3"].dy),justify="center",layer=LAYERS.LABEL)
+        uno_wg.add_label(c,Label,size=30,position=(Settings.DEFAULT_GRATING_DIST*1.5,50+r.ports["o3"].dy),justify="center",layer=LAYERS.LABEL)
     return c
 
 @gf.cell
@@ -332,7 +340,73 @@ def two_grating_loopback(gratingCoupler = None, Label = None):
     c.info["measurement"] = "alignment"
     
     if Label is not None:
-        t = c << gf.components.text(Label,size=20,position=(Settings.DEFAULT_GRATING_DIST/2, c1.ports["o1"].dy),justify="center",layer=LAYERS.LABEL)
+        uno_wg.add_label(c,Label,size=20,position=(Settings.DEFAULT_GRATING_DIST/2, c1.ports["o1"].dy),justify="center",layer=LAYERS.LABEL)
+    return c
+
+@gf.cell
+def grating_array_test(gratingComponent,
+                       duts, # tuple of components to route to the gratings (gf.cell needs it hashable)
+                       numGratings = 16, # must be even
+                       gratingPitch = 250e0,
+                       dutPortOrders = None, # per DUT, its ports in grating order (left to right)
+                       dutOffset = 160e0, # distance of DUT centers below the grating ports
+                       loopback_spacing_to_grating = 50e0,
+                       wgWidth = DEFAULT_WG_WIDTH):
+    # generalization of sixteen_grating_3_rings (examples/grating_tests.py) to any
+    # number of gratings and DUTs: gratings 0 and N-1 are an outer loopback, the
+    # middle two are a short loopback, and DUTs take the remaining gratings in
+    # order, each centered under the gratings it's routed to
+    c = gf.Component()
+    waveguideXs = waveguide_xs(wgWidth)
+    # gratings as a single array reference, centered on x = 0 like grating_coupler_array
+    rotGrating = uno_tools.rotated(gratingComponent, 90)
+    gratingArray = c.add_ref(rotGrating, columns = numGratings, rows = 1, 
+                             spacing = (gratingPitch, 0))
+    gratingArray.dmovex(-(numGratings - 1)/2*gratingPitch - rotGrating.dbbox().center().x)
+    gratingPorts = uno_tools.array_ports(gratingArray, "o1")
+    
+    # loop back on first and last gratings
+    loopback_y1 = gratingArray.dymin - loopback_spacing_to_grating
+    loopback_y2 = gratingArray.dymax + loopback_spacing_to_grating
+    gf.routing.route_single_from_steps(c,
+        gratingPorts[0], gratingPorts[-1], 
+        steps = [
+        {"y": loopback_y1},
+        {"dx": -gratingPitch},
+        {"y": loopback_y2},
+        {"dx": (numGratings+1)*gratingPitch},
+        {"y": loopback_y1},
+        {"dx": -gratingPitch}
+        ])
+    midIdx = numGratings//2
+    gf.routing.route_single(c, gratingPorts[midIdx - 1], gratingPorts[midIdx])
+    
+    # assign the remaining gratings to DUT ports in order
+    freeGratings = [i for i in range(1, numGratings - 1) if i not in (midIdx - 1, midIdx)]
+    portGroups = {} # {(dutIdx, port orientation): [(grating port, DUT port)]}
+    for dutIdx, dutComponent in enumerate(duts):
+        if dutPortOrders is None or dutPortOrders[dutIdx] is None:
+            # default to left-to-right, which doesn't cross for most DUTs
+            thisOrder = [p.name for p in sorted(dutComponent.ports, key = lambda p: p.dcenter[0])
+                         if p.port_type == "optical"]
+        else:
+            thisOrder = dutPortOrders[dutIdx]
+        if len(thisOrder) > len(freeGratings):
+            raise Exception(f"Not enough gratings for DUT {dutIdx}: needs {len(thisOrder)}, {len(freeGratings)} left. Increase numGratings.")
+        theseGratings = [gratingPorts[i] for i in freeGratings[:len(thisOrder)]]
+        freeGratings = freeGratings[len(thisOrder):]
+        thisDut = c << dutComponent
+        dutX = np.mean([p.dcenter[0] for p in theseGratings])
+        thisDut.dmove(dp2tuple(thisDut.dcenter), (dutX, theseGratings[0].dcenter[1] - dutOffset))
+        # ports on the same side of a DUT go out together as one bundle
+        for gratingPort, name in zip(theseGratings, thisOrder):
+            portGroups.setdefault((dutIdx, thisDut.ports[name].orientation), []).append(
+                (gratingPort, thisDut.ports[name]))
+    
+    # route every DUT side as one bundle once everything is placed
+    for thesePairs in portGroups.values():
+        gf.routing.route_bundle(c, [p[0] for p in thesePairs], [p[1] for p in thesePairs],
+                                cross_section = waveguideXs)
     return c
 
 # routes electrical and optical made by gen_racetrack
@@ -417,7 +491,8 @@ def gen_MZI_unbal(coupler, offsetX, dxdy, wgWidth, dL,
     couplerPortSep = (m.ports["o1"].dcenter - m.ports["o2"].dcenter)[1]
     sBendY = (edgeSep - couplerPortSep)/2
     baseSbend = gf.components.bend_s(size=(sBendX, sBendY), 
-                                     cross_section=crossSection)
+                                     cross_section=crossSection,
+                                     **bend_s_npoints((sBendX, sBendY), crossSection.width))
     s1 = c << baseSbend
     s2 = c << baseSbend
     s3 = c << baseSbend
@@ -442,9 +517,9 @@ def gen_MZI_unbal(coupler, offsetX, dxdy, wgWidth, dL,
     c.add(gf.routing.get_route(s4.ports['o2'], 
                                       e2.ports["o2"],
                                       cross_section=crossSection).references)
-    c << gf.components.text(text = f"{1e-3*dL:.2f}mm", 
-                            layer = LAYERS.ANNOTATION,
-                            position = (m.dcenter[0], m.dcenter[1]),
-                            justify = "center",
-                            size = DEFAULT_TEXT_SIZE)
+    uno_wg.add_label(c, f"{1e-3*dL:.2f}mm", 
+                     layer = LAYERS.ANNOTATION,
+                     position = (m.dcenter[0], m.dcenter[1]),
+                     justify = "center",
+                     size = DEFAULT_TEXT_SIZE)
     return c
\ No newline at end of file
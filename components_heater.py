@@ -1,6 +1,11 @@
 import numpy as np
+import scipy.optimize
 import gdsfactory as gf
-from uno_layout import LAYERS, DEFAULT_ROUTE_WIDTH, routing_xs
+import uno_layout.tools as uno_tools
+import uno_layout.components_wg as uno_wg
+from uno_layout import Settings, LayerMapUNO, routing_xs, layer_index
+LAYERS = LayerMapUNO
+DEFAULT_ROUTE_WIDTH = Settings.DEFAULT_ROUTE_WIDTH
 
 @gf.cell
 def rect_heater(length = 50, width = 10, routeWidth = None):
@@ -48,11 +53,13 @@ def pad_array(
     """Returns 2D array of pads with incremented electrical port #'s
     """
     c = gf.Component()
-    c.add_ref(pad, columns=columns, rows=rows, spacing=spacing)
+    if pad_rotation != 0:
+        pad = uno_tools.rotated(pad, pad_rotation)
+    pads = c.add_ref(pad, columns=columns, rows=rows, spacing=spacing)
+    padPorts = uno_tools.array_ports(pads, 'e0')
     for col in range(columns):
         for row in range(rows):
-            thisPad = (c << pad).rotate(pad_rotation).move((col * spacing[0], row * spacing[1]))
-            c.add_port(name = f"e{row+1}{col+1}", port =  thisPad.ports['e0'])
+            c.add_port(name = f"e{row+1}{col+1}", port = padPorts[row*columns + col])
     return c
 
 @gf.cell
@@ -94,10 +101,226 @@ def snake_heater(length = 1000,
     c = gf.Component()
     snake = c << gf.path.extrude(P, thisSection)
     TEXT_SIZE = 25
-    c << gf.components.text(text = f"{1e-3*P.length():.0f}mm/{width:.2f}um = {P.length()/width:.1f}", 
-                            layer = LAYERS.ANNOTATION,
-                            position = np.array(snake.center) - np.array((0,2*TEXT_SIZE)),
-                            justify = "center",
-                            size = TEXT_SIZE)
+    uno_wg.add_label(c, f"{1e-3*P.length():.0f}mm/{width:.2f}um = {P.length()/width:.1f}", 
+                     layer = LAYERS.ANNOTATION,
+                     position = np.array((snake.dcenter.x, snake.dcenter.y)) - np.array((0,2*TEXT_SIZE)),
+                     justify = "center",
+                     size = TEXT_SIZE)
     c.add_ports(snake.ports)
-    return c
\ No newline at end of file
+    return c
+
+# each 90 degree corner of a snake counts as this many squares
+SNAKE_CORNER_SQUARES = 0.56
+
+@gf.cell
+def snake_heater_segment(length = 1000, width = 10):
+    # one straight snake leg, centered, shared by every snake with this length/width
+    c = gf.Component()
+    c << gf.components.rectangle(size = (width, length), layer = LAYERS.HEATER, centered = True)
+    c.add_port('e0', center = (0, -length/2), orientation = -90, width = width, 
+               layer = LAYERS.HEATER, port_type = 'electrical')
+    c.add_port('e1', center = (0, length/2), orientation = 90, width = width, 
+               layer = LAYERS.HEATER, port_type = 'electrical')
+    return c
+
+@gf.cell
+def snake_heater_uturn(spacing = 25, width = 10):
+    # bar joining two legs spacing apart, centered on the corner points (0,0) and (spacing,0)
+    c = gf.Component()
+    bar = c << gf.components.rectangle(size = (spacing + width, width), layer = LAYERS.HEATER, 
+                                       centered = True)
+    bar.dmovex(spacing/2)
+    return c
+
+def snake_heater_metrics(length = 1000, N = 5, spacing = 25, width = 10, extraEnds = 50,
+                         sheetRes = Settings.DEFAULT_HEATER_SHEET_RES):
+    # analytic centerline length, squares and resistance of snake heaters, broadcast
+    # over array arguments. each U-turn has two corners worth SNAKE_CORNER_SQUARES each
+    length, N, spacing, width, extraEnds = np.broadcast_arrays(length, N, spacing, width, extraEnds)
+    totalLength = N*length + (N - 1)*spacing + 2*extraEnds
+    squares = totalLength/width - 2*(N - 1)*(1 - SNAKE_CORNER_SQUARES)
+    return totalLength, squares, sheetRes*squares
+
+@gf.cell
+def snake_heater_cells(length = 1000,
+                       N = 5,
+                       spacing = 25,
+                       width = 10,
+                       extraEnds = 50):
+    # same geometry as snake_heater (unrotated, unlabeled), but built from array references
+    # to shared leg/U-turn cells instead of one extruded path
+    c = gf.Component()
+    leg = snake_heater_segment(length, width)
+    legs = c.add_ref(leg, columns = N, rows = 1, spacing = (spacing, 0))
+    legs.dmove((-spacing*(N - 1)/2, 0))
+    uturn = snake_heater_uturn(spacing, width)
+    # top U-turns join legs (0,1), (2,3)..., bottom ones join (1,2), (3,4)...
+    for firstLeg, y in ((0, length/2), (1, -length/2)):
+        numTurns = (N - firstLeg)//2
+        if numTurns > 0:
+            turns = c.add_ref(uturn, columns = numTurns, rows = 1, spacing = (2*spacing, 0))
+            turns.dmove((spacing*(firstLeg - (N - 1)/2), y))
+    # straight extensions at both ends
+    lead = snake_heater_segment(extraEnds, width)
+    firstLead = c << lead
+    firstLead.dmove((-spacing*(N - 1)/2, -(length + extraEnds)/2))
+    lastLead = c << lead
+    if N % 2 == 0:
+        lastLead.dmove((spacing*(N - 1)/2, -(length + extraEnds)/2))
+        c.add_port('e1', port = lastLead.ports['e0'])
+    else:
+        lastLead.dmove((spacing*(N - 1)/2, (length + extraEnds)/2))
+        c.add_port('e1', port = lastLead.ports['e1'])
+    c.add_port('e0', port = firstLead.ports['e0'])
+    totalLength, squares, resistance = snake_heater_metrics(length, N, spacing, width, extraEnds)
+    c.info["length"] = float(totalLength)
+    c.info["squares"] = float(squares)
+    c.info["resistance"] = float(resistance)
+    return c
+
+@gf.cell
+def snake_heater_family(length = (1000,),
+                        N = (5,),
+                        spacing = (25,),
+                        width = (10,),
+                        extraEnds = 50,
+                        gap = 100, # x gap between neighbouring heaters
+                        textSize = 25):
+    # row of snake heaters over every (broadcast) combination of length, N, spacing, width,
+    # all sharing leg/U-turn cells. length/squares/resistance are computed analytically
+    # and stored per variant in info, in placement order
+    c = gf.Component()
+    length, N, spacing, width = np.broadcast_arrays(length, N, spacing, width)
+    totalLengths, squares, resistances = snake_heater_metrics(length, N, spacing, width, extraEnds)
+    x = 0e0
+    for idx in range(length.size):
+        thisHeater = c << snake_heater_cells(float(length.flat[idx]), int(N.flat[idx]), 
+                                             float(spacing.flat[idx]), float(width.flat[idx]), 
+                                             extraEnds)
+        thisHeater.dmove((x - thisHeater.dxmin, -thisHeater.dcenter.y))
+        x = thisHeater.dxmax + gap
+        uno_wg.add_label(c, f"{1e-3*totalLengths.flat[idx]:.0f}mm/{width.flat[idx]:.2f}um = {squares.flat[idx]:.1f}", 
+                         layer = LAYERS.ANNOTATION,
+                         position = (thisHeater.dcenter.x, thisHeater.dymin - 2*textSize),
+                         justify = "center",
+                         size = textSize)
+        c.add_port(f"e{2*idx}", port = thisHeater.ports['e0'])
+        c.add_port(f"e{2*idx + 1}", port = thisHeater.ports['e1'])
+    c.info["lengths"] = totalLengths.ravel().tolist()
+    c.info["squares"] = squares.ravel().tolist()
+    c.info["resistances"] = resistances.ravel().tolist()
+    return c
+
+def _escape_points(start, orientation, deviceX, channelPitch, escapeLength):
+    # start of a heater trace: escape along the port, and jog sideways (away from the
+    # device center) if the port faces up. the trace drops to the channel from the last point
+    direction = np.array((np.cos(np.radians(orientation)), np.sin(np.radians(orientation))))
+    points = [np.array(start), np.array(start) + escapeLength*direction]
+    if direction[1] > 0.5:
+        side = 1 if points[-1][0] >= deviceX else -1
+        points.append(points[-1] + (side*channelPitch, 0))
+    return points
+
+def _fanout_points(escapePoints, padPort, level, channelTop, channelPitch):
+    # manhattan centerline from a heater port down to a pad: the escape points, then
+    # drop to this trace's channel level, run across to the pad and drop onto it
+    points = list(escapePoints)
+    channelY = min(channelTop, points[-1][1]) - level*channelPitch
+    points.append(np.array((points[-1][0], channelY)))
+    points.append(np.array((padPort.dcenter[0], channelY)))
+    points.append(np.array(padPort.dcenter))
+    # drop repeated points, they make zero-length segments
+    cleanPoints = [points[0]]
+    for thisPoint in points[1:]:
+        if np.linalg.norm(thisPoint - cleanPoints[-1]) > 1e-6:
+            cleanPoints.append(thisPoint)
+    return cleanPoints
+
+@gf.cell
+def heater_fanout(devices, # tuple of heated components, e.g. gen_racetrack(includeHeater = True)
+                  pad = None, # defaults to rectPad()
+                  devicePitch = 500e0, # x spacing of devices
+                  padPitch = 250e0, # x spacing of pads
+                  padDistance = 200e0, # min distance from the routing channel to the pads
+                  heaterPorts = ("e1", "e2"), # heater port names on each device
+                  assignment = "crossing", # "crossing" or "length"
+                  routeWidth = None,
+                  routeSpacing = 20e0, # edge-to-edge spacing of traces in the channel
+                  escapeLength = 30e0): # straight out of each heater port
+    # place a row of heated devices above a row of pads, assign every heater port a
+    # pad and route them all on ROUTING in one pass through a channel between the two.
+    # "crossing" keeps heater and pad order (planar, no crossings). "length" solves
+    # the minimum total manhattan length assignment (planar where that is a tie), and
+    # raises if its traces would cross.
+    c = gf.Component()
+    pad = rectPad(routeWidth = routeWidth) if pad is None else pad
+    xs = routing_xs(routeWidth)
+    channelPitch = xs.width + routeSpacing
+    
+    refs = []
+    for devIdx, thisDevice in enumerate(devices):
+        thisRef = c << thisDevice
+        thisRef.dmove((thisRef.dcenter.x, thisRef.dcenter.y), (devIdx*devicePitch, 0))
+        refs.append(thisRef)
+    heaters = [(devIdx, thisRef.ports[name]) for devIdx, thisRef in enumerate(refs)
+               for name in heaterPorts]
+    numPads = len(heaters)
+    
+    # pads go below the channel, centered under the devices
+    channelTop = min(r.dymin for r in refs) - escapeLength - channelPitch
+    pads = c << pad_array(pad, spacing = (padPitch, padPitch), columns = numPads, rows = 1,
+                          cross_section = xs)
+    padPorts = [pads.ports[f"e1{col+1}"] for col in range(numPads)]
+    padsCenterX = (padPorts[0].dcenter[0] + padPorts[-1].dcenter[0])/2
+    pads.dmovex((len(devices) - 1)*devicePitch/2 - padsCenterX)
+    padPorts = [pads.ports[f"e1{col+1}"] for col in range(numPads)]
+    
+    # traces are ordered by where they drop into the channel, after any sideways jog
+    escapes = [_escape_points(p.dcenter, p.orientation, refs[devIdx].dcenter.x, channelPitch, escapeLength)
+               for devIdx, p in heaters]
+    heaterX = np.array([thisEscape[-1][0] for thisEscape in escapes])
+    padX = np.array([p.dcenter[0] for p in padPorts])
+    if assignment == "crossing":
+        padForHeater = np.empty(numPads, dtype = int)
+        padForHeater[np.argsort(heaterX, kind = "stable")] = np.argsort(padX, kind = "stable")
+    elif assignment == "length":
+        heaterY = np.array([p.dcenter[1] for _, p in heaters])
+        cost = np.abs(heaterX[:, None] - padX[None, :]) + np.abs(heaterY - channelTop)[:, None]
+        # tiny penalty on reordering, so ties go to the planar (order-preserving) assignment
+        heaterRank = np.argsort(np.argsort(heaterX, kind = "stable"))
+        padRank = np.argsort(np.argsort(padX, kind = "stable"))
+        cost += 1e-9*(heaterRank[:, None] - padRank[None, :])**2
+        _, padForHeater = scipy.optimize.linear_sum_assignment(cost)
+    else:
+        raise Exception("assignment must be 'crossing' or 'length'!")
+    
+    # channel levels: traces running left take levels by increasing drop x,
+    # traces running right by decreasing drop x, so order-preserving routes never cross
+    levels = np.zeros(numPads, dtype = int)
+    goesLeft = padX[padForHeater] < heaterX
+    goesRight = padX[padForHeater] > heaterX
+    for thisGroup, sortSign in ((goesLeft, 1), (goesRight, -1)):
+        groupIdx = np.flatnonzero(thisGroup)
+        levels[groupIdx[np.argsort(sortSign*heaterX[groupIdx], kind = "stable")]] = np.arange(len(groupIdx))
+    channelBottom = channelTop - (levels.max() + 1)*channelPitch
+    pads.dmovey(channelBottom - padDistance - padPorts[0].dcenter[1])
+    padPorts = [pads.ports[f"e1{col+1}"] for col in range(numPads)]
+    
+    # all traces go into one merged region on the cross section's layer
+    dbu = c.kcl.layout.dbu
+    traces = gf.kdb.Region()
+    for heaterIdx in range(numPads):
+        points = _fanout_points(escapes[heaterIdx], padPorts[padForHeater[heaterIdx]], 
+                                levels[heaterIdx], channelTop, channelPitch)
+        thisPath = gf.kdb.DPath([gf.kdb.DPoint(*p) for p in points], xs.width)
+        traces.insert(thisPath.to_itype(dbu))
+    traces.merge()
+    if traces.count() != numPads:
+        raise Exception(f"heater_fanout traces short together ({traces.count()} nets for {numPads} "
+                        f"heater ports), use assignment = 'crossing' or a larger routeSpacing!")
+    c.shapes(layer_index(xs.layer, c)).insert(traces)
+    
+    c.add_ports(pads.ports)
+    c.info["assignment"] = [(int(heaters[i][0]), heaters[i][1].name, padPorts[padForHeater[i]].name)
+                            for i in range(numPads)]
+    return c
@@ -1,3 +1,4 @@
+import os
 import numpy as np
 import numpy.random as np_random
 from random import random
@@ -5,7 +6,9 @@ from math import cos, sin, floor, sqrt, pi, ceil
 import scipy.stats
 import random
 import gdsfactory as gf
-from uno_layout import Settings, LayerMapUNO, waveguide_xs
+from gdsfactory.constants import _glyph, _indent, _width
+from uno_layout import (Settings, LayerMapUNO, waveguide_xs, layer_index,
+                        arc_npoints, euler_npoints, bend_s_npoints, circle_resolution)
 DEFAULT_EDGE_SEP = Settings.DEFAULT_EDGE_SEP # Not used yet
 DEFAULT_TEXT_SIZE = Settings.DEFAULT_TEXT_SIZE
 
@@ -48,7 +51,8 @@ def coupler_asymmetric(
     c = gf.Component()
     x = gf.get_cross_section(cross_section)
     width = x.width
-    bend = gf.components.bend_s(size=(dx, dy - gap - width), cross_section=cross_section)
+    bend = gf.components.bend_s(size=(dx, dy - gap - width), cross_section=cross_section,
+                                **bend_s_npoints((dx, dy - gap - width), width))
     wg = gf.components.straight(cross_section=cross_section, length = straight_length)
 
     w = bend.ports[0].dwidth
@@ -106,8 +110,9 @@ def asymmetric_coupler(wgWidth = 0.5,
     s1.dmovey((couplerGap + wgWidth)/2)
     s2.dmovey(-(couplerGap + wgWidth)/2)
 
-    b1 = c << gf.components.bend_s(size=(couplerDx,couplerDy), cross_section=crossSection)
-    b2 = c << gf.components.bend_s(size=(couplerDx,couplerDy), cross_section=crossSection)
+    sBendPoints = bend_s_npoints((couplerDx,couplerDy), wgWidth)
+    b1 = c << gf.components.bend_s(size=(couplerDx,couplerDy), cross_section=crossSection, **sBendPoints)
+    b2 = c << gf.components.bend_s(size=(couplerDx,couplerDy), cross_section=crossSection, **sBendPoints)
     b2.mirror_x()
     b1.connect("o1", s1.ports["o2"])
     b2.connect("o1", s1.ports["o1"])
@@ -190,8 +195,8 @@ def apodized_grating_coupler_rectangular(
         gaps.append((1-F) * this_period)
         curr_pos = curr_pos + this_period
     return gf.components.grating_coupler_rectangular_arbitrary(
-        gaps = gaps, 
-        widths = widths,
+        gaps = tuple(gaps), 
+        widths = tuple(widths),
         width_grating = width_grating,
         length_taper = length_taper,
         layer_slab = layerSlab,
@@ -243,8 +248,9 @@ def mode_filter(wgWidth = Settings.DEFAULT_WG_WIDTH,
     # series of 4 bends to toss out any weakly-guided modes
     c = gf.Component()
     thisXs = waveguide_xs(wgWidth)
-    rightBend = gf.components.bend_euler(radius = radius, angle=90, cross_section = thisXs)
-    leftBend = gf.components.bend_euler(radius = radius, angle=-90, cross_section = thisXs)
+    bendPoints = euler_npoints(radius, 90, width = wgWidth)
+    rightBend = gf.components.bend_euler(radius = radius, angle=90, cross_section = thisXs, **bendPoints)
+    leftBend = gf.components.bend_euler(radius = radius, angle=-90, cross_section = thisXs, **bendPoints)
     symbol_to_component = {
         "r": (rightBend, "o1", "o2"),
         "L": (leftBend, "o1", "o2"),
@@ -256,6 +262,165 @@ def mode_filter(wgWidth = Settings.DEFAULT_WG_WIDTH,
     
     return c
 
+def _spiral_bend_constants(bend):
+    # length of a 180 and a 90 degree bend, and how far a 180 degree bend sticks
+    # out past the end of the straight it's attached to, all per unit (effective) radius
+    if bend == "circular":
+        return pi, pi/2, 1e0
+    elif bend == "euler":
+        # euler bends are self-similar, so lengths scale linearly with radius too
+        p180 = gf.path.euler(radius = 1e0, angle = 180, p = 0.5, use_eff = True)
+        p90 = gf.path.euler(radius = 1e0, angle = 90, p = 0.5, use_eff = True)
+        return p180.length(), p90.length(), float(np.max(p180.points[:, 0]))
+    raise Exception("spiral bend must be 'circular' or 'euler'!")
+
+def _spiral_geometry(nLoops, targetLength, spacing, radius, bend):
+    # straight length and width of the double spiral with nLoops bends per arm
+    # that has total length targetLength (see double_spiral for the geometry)
+    c180, c90, extent = _spiral_bend_constants(bend)
+    r0 = radius + spacing/2
+    sBendExtra = 2*c90*radius - 2*radius # S-bend length minus the straight it replaces
+    bendLength = c180*(2*nLoops*r0 + spacing*nLoops*(nLoops - 1))
+    straightLength = (targetLength - bendLength - sBendExtra)/(2*nLoops + 1)
+    width = straightLength + 2*extent*(r0 + (nLoops - 1)*spacing)
+    return straightLength, width
+
+def spiral_solve(lengths, # target length(s), um
+                 footprint = (1000e0, 1000e0), # max (width, height) of the spiral
+                 spacing = 5e0, # waveguide center-to-center spacing
+                 wgWidth = None,
+                 radius = None, # minimum bend radius, defaults to the cross section's
+                 bend = "circular"): # or "euler"
+    # number of loops per arm and straight length for double_spiral to hit each
+    # target length inside footprint, solved for all targets at once.
+    # uses the fewest loops (longest straights) that fit the footprint width:
+    # with n loops, (2n+1)*(width(n) - maxWidth) is quadratic in n, so n is the
+    # first integer above its smaller root
+    lengths = np.atleast_1d(np.asarray(lengths, dtype = float))
+    xs = waveguide_xs(wgWidth, radius = radius)
+    radius = xs.radius
+    c180, c90, extent = _spiral_bend_constants(bend)
+    maxWidth = footprint[0] - xs.width
+    maxLoops = int(floor((footprint[1] - xs.width - 2*radius)/(2*spacing)))
+    r0 = radius + spacing/2
+    a = (4*extent - c180)*spacing
+    b = -2*c180*r0 + c180*spacing + 2*extent*(2*r0 - spacing) - 2*maxWidth
+    cc = lengths - (2*c90*radius - 2*radius) + 2*extent*(r0 - spacing) - maxWidth
+    if a > 0:
+        disc = b*b - 4*a*cc
+        root = (-b - np.sqrt(np.maximum(disc, 0e0)))/(2*a)
+        nLoops = np.maximum(1, np.ceil(root - 1e-9)).astype(int)
+        # no real root means no loop count is narrow enough
+        nLoops[disc < 0] = maxLoops + 1
+    else:
+        # bends longer than 4x their radius (very long euler bends): the width
+        # only shrinks with n, so bisect on the loop count, vectorized over targets
+        lo = np.ones(len(lengths), dtype = int)
+        hi = np.full(len(lengths), max(maxLoops, 1))
+        while np.any(lo < hi):
+            active = lo < hi
+            mid = (lo + hi)//2
+            fits = _spiral_geometry(mid, lengths, spacing, radius, bend)[1] <= maxWidth
+            hi = np.where(active & fits, mid, hi)
+            lo = np.where(active & ~fits, mid + 1, lo)
+        nLoops = lo
+    straightLength, width = _spiral_geometry(nLoops, lengths, spacing, radius, bend)
+    bad = (nLoops > maxLoops) | (width > maxWidth + 1e-6) | (straightLength < 2*radius)
+    if np.any(bad):
+        raise Exception(f"Spiral lengths {lengths[bad]} don't fit in footprint {footprint} with spacing {spacing}. Try a larger footprint, a smaller spacing, or a longer target length (straights must be >= 2*radius).")
+    # snap straights down to the grid, the exact length is recomputed in double_spiral
+    straightLength = np.floor(straightLength*1e3)/1e3
+    return nLoops, straightLength
+
+@gf.cell
+def double_spiral(nLoops = 10, # number of 180 degree bends per arm
+                  straightLength = 500e0, 
+                  spacing = 5e0,
+                  wgWidth = None,
+                  radius = None,
+                  bend = "circular"):
+    # double (in/out) racetrack spiral built from shared bend cells:
+    # an S-bend in the middle, then each arm alternates a 180 degree bend of radius
+    # radius + spacing/2 + k*spacing and a straight of straightLength, so the arms
+    # interleave at spacing and the total length is known in closed form
+    c = gf.Component()
+    xs = waveguide_xs(wgWidth, radius = radius)
+    radius = xs.radius
+    r0 = radius + spacing/2
+    c180, c90, extent = _spiral_bend_constants(bend)
+    def spiral_bend(thisRadius, angle):
+        if bend == "circular":
+            return gf.components.bend_circular(radius = thisRadius, angle = angle, cross_section = xs,
+                                               **arc_npoints(thisRadius, angle, xs.width))
+        return gf.components.bend_euler(radius = thisRadius, angle = angle, p = 0.5,
+                                        with_arc_floorplan = True, cross_section = xs,
+                                        **euler_npoints(thisRadius, angle, 0.5, True, xs.width))
+    
+    # S-bend in the middle
+    a1 = c << spiral_bend(radius, 90)
+    a2 = c << spiral_bend(radius, -90)
+    a2.connect('o1', a1.ports['o2'])
+    armPorts = [a1.ports['o1'], a2.ports['o2']]
+    if straightLength > 2*radius:
+        sMid = c << gf.components.straight(length = straightLength - 2*radius, cross_section = xs)
+        sMid.connect('o1', a2.ports['o2'])
+        armPorts[1] = sMid.ports['o2']
+    
+    # both arms turn the same way (clockwise), so they interleave
+    armStraight = gf.components.straight(length = straightLength, cross_section = xs)
+    for armIdx in range(2):
+        thisPort = armPorts[armIdx]
+        for loopIdx in range(nLoops):
+            thisBend = c << spiral_bend(r0 + loopIdx*spacing, -180)
+            thisBend.connect('o1', thisPort)
+            thisStraight = c << armStraight
+            thisStraight.connect('o1', thisBend.ports['o2'])
+            thisPort = thisStraight.ports['o2']
+        armPorts[armIdx] = thisPort
+    c.add_port('o1', port = armPorts[0])
+    c.add_port('o2', port = armPorts[1])
+    
+    c.info["length"] = float(2*c90*radius + (straightLength - 2*radius)
+                             + 2*nLoops*straightLength 
+                             + c180*(2*nLoops*r0 + spacing*nLoops*(nLoops - 1)))
+    c.info["loops"] = nLoops
+    return c
+
+def spiral_delay_line(length = 10000e0, 
+                      footprint = (1000e0, 1000e0),
+                      spacing = 5e0,
+                      wgWidth = None,
+                      radius = None,
+                      bend = "circular"):
+    # double_spiral with the loop count and straights solved for a target length,
+    # can be passed straight to generic_2port (sets info["length"])
+    nLoops, straightLength = spiral_solve(length, footprint, spacing, wgWidth, radius, bend)
+    return double_spiral(int(nLoops[0]), float(straightLength[0]), spacing, wgWidth, radius, bend)
+
+@gf.cell
+def spiral_cutback_family(lengths = (5e3, 1e4, 2.5e4, 5e4, 1e5), # e.g. 0.5-10cm
+                          footprint = (1000e0, 1000e0),
+                          spacing = 5e0,
+                          wgWidth = None,
+                          radius = None,
+                          bend = "circular",
+                          pitch = None): # x distance between spirals
+    # whole cutback family in one call: all lengths are solved together and the
+    # spirals share their bend cells (only the straights differ)
+    c = gf.Component()
+    pitch = footprint[0] + DEFAULT_EDGE_SEP if pitch is None else pitch
+    nLoops, straightLengths = spiral_solve(lengths, footprint, spacing, wgWidth, radius, bend)
+    actualLengths = []
+    for idx in range(len(nLoops)):
+        s = c << double_spiral(int(nLoops[idx]), float(straightLengths[idx]), 
+                               spacing, wgWidth, radius, bend)
+        s.dmove((s.dcenter.x, s.dcenter.y), (idx*pitch, 0))
+        c.add_port(f"o{2*idx + 1}", port = s.ports['o1'])
+        c.add_port(f"o{2*idx + 2}", port = s.ports['o2'])
+        actualLengths.append(s.cell.info["length"])
+    c.info["lengths"] = actualLengths
+    return c
+
 @gf.cell
 def random_fill_naive(size = (100e0,50e0), # dimensions of region
                 postRad = 0.5e0, # radius of posts
@@ -271,7 +436,7 @@ def random_fill_naive(size = (100e0,50e0), # dimensions of region
     postCoords = np.array(size)*np_random.rand(numPosts, 2)
     postCoords = poisson_disc_samples(size[0], size[1])
     for i in range(numPosts):
-        (c << gf.components.circle(radius = postRad, layer = layer)).dmove(postCoords[i])
+        (c << gf.components.circle(radius = postRad, layer = layer, **circle_resolution(postRad))).dmove(postCoords[i])
     c.flatten()
     return c
 @gf.cell
@@ -286,7 +451,7 @@ def random_fill_poisson(size = (100e0,50e0), # dimensions of region
     postCoords = poisson_disc_samples(size[0], size[1], radius)
     numPosts = len(postCoords)
     for i in range(numPosts):
-        (c << gf.components.circle(radius = postRad, layer = layer)).dmove(postCoords[i])
+        (c << gf.components.circle(radius = postRad, layer = layer, **circle_resolution(postRad))).dmove(postCoords[i])
     c.flatten()
     return c
 
@@ -350,11 +515,11 @@ def die_and_floorplan(dieWidth = 10000e0, desWidth = DEFAULT_DES_WIDTH):
     c = gf.Component()
     # die
     c << gf.components.rectangle(
-        size = [dieWidth, dieWidth], centered = True,
+        size = (dieWidth, dieWidth), centered = True,
         layer = LayerMapUNO.DIE)
     # design region
     c << gf.components.rectangle(
-        size = [desWidth, desWidth], centered = True,
+        size = (desWidth, desWidth), centered = True,
         layer = LayerMapUNO.FLOORPLAN)
     return c
 
@@ -366,7 +531,7 @@ def ant_4x4_template():
     c = gf.Component()
     # design region
     c << gf.components.rectangle(
-        size = [desWidth, desWidth], centered = True,
+        size = (desWidth, desWidth), centered = True,
         layer = LayerMapUNO.FLOORPLAN)
     # deep trench
     c << gf.components.rectangle(
@@ -384,10 +549,11 @@ def ant_trench_perimeter():
     innerWidth = 8780e0
     outerWidth = 9300e0
     c = gf.Component()
-    for angle in [0, 90, 180, 270]:
-        (c << gf.components.bbox(
-            left = -outerWidth/2, bottom = innerWidth/2, top = outerWidth/2, right = outerWidth/2,
-            layer = LayerMapUNO.ANT_EDGE_TRENCH)).drotate(angle)
+    # square ring of trench, as one merged region
+    dbu = c.kcl.layout.dbu
+    ring = (gf.kdb.Region(gf.kdb.DBox(outerWidth, outerWidth).to_itype(dbu)) 
+            - gf.kdb.Region(gf.kdb.DBox(innerWidth, innerWidth).to_itype(dbu)))
+    c.shapes(layer_index(LayerMapUNO.ANT_EDGE_TRENCH, c)).insert(ring)
     return c
 
 @gf.cell
@@ -404,7 +570,7 @@ def mla_cross(layer,
     
     c << gf.components.cross(thick, length, layer = layer)
     if(dot):
-        circ = c << gf.components.circle(radius = dotRad, layer = layer)
+        circ = c << gf.components.circle(radius = dotRad, layer = layer, **circle_resolution(dotRad))
         circ.dmove((-dotDx, -dotDy))
     return c
 
@@ -415,13 +581,10 @@ def mla_crosses(dx = 4000e0,
                 includeArrow = True):
     c = gf.Component()
     cross = mla_cross(layer = thisLayer)
-    for cIdx in range(4):
-        thisC = c << cross
-        thisC.dmove((dx,dy))
-        if(cIdx == 1 or cIdx == 3):
-            thisC.mirror((0,1))
-        if(cIdx == 2 or cIdx == 3):
-            thisC.mirror((1,0))
+    # the cross (without dot) is mirror symmetric, so the four mirrored copies
+    # at (+-dx, +-dy) are just one 2x2 array
+    crosses = c.add_ref(cross, columns = 2, rows = 2, spacing = (2*dx, 2*dy))
+    crosses.dmove((-dx, -dy))
     # big "this way up" arrows
     if(includeArrow):
         a = c << arrow(height = 100)
@@ -442,15 +605,30 @@ def bosch_for_quadrants(boschWidth = DEFAULT_BOSCH_WIDTH,
                       desWidth = DEFAULT_DES_WIDTH):
     # marks on wg layer
     c = gf.Component()
-    # Bosch deep trench zones
-    c << gf.components.rectangle(
-        size = (boschWidth, desWidth), centered=True,
-        layer = LayerMapUNO.BOSCH)
-    c << gf.components.rectangle(
-        size = (desWidth, boschWidth), centered=True, # alternative to rotate(90)
-        layer = LayerMapUNO.BOSCH)
+    # Bosch deep trench zones, one merged cross
+    c.shapes(layer_index(LayerMapUNO.BOSCH, c)).insert(_merged_boxes(
+        c, [(0, 0, boschWidth, desWidth), (0, 0, desWidth, boschWidth)]))
     return c
 
+def _merged_boxes(c, boxes):
+    # one merged region from (xCenter, yCenter, width, height) boxes in um
+    dbu = c.kcl.layout.dbu
+    region = gf.kdb.Region()
+    for x, y, w, h in boxes:
+        region.insert(gf.kdb.DBox(x - w/2, y - h/2, x + w/2, y + h/2).to_itype(dbu))
+    region.merge()
+    return region
+
+def _regular_pitch(coords):
+    # (first, pitch, count) if coords are evenly spaced, else None
+    coords = np.sort(np.asarray(coords, dtype = float))
+    if len(coords) < 2:
+        return (coords[0], 0e0, 1) if len(coords) == 1 else None
+    steps = np.diff(coords)
+    if np.allclose(steps, steps[0]) and steps[0] > 0:
+        return (coords[0], steps[0], len(coords))
+    return None
+
 @gf.cell
 def dicing_lanes(lanesX, # x coordinates of vertical dicing (list)
                  lanesY, # y coordinates of horizontal dicing (list)
@@ -475,44 +653,50 @@ def dicing_lanes(lanesX, # x coordinates of vertical dicing (list)
     #     thisT.move((0, thisY))
         
     # crosses
+    # evenly spaced lanes get one array reference per direction
     if(doCrosses):
         crossForDicing = mla_cross(layer= tickLayer, dot = False)
-        for thisX in lanesX:
-            thisT = c << crossForDicing 
-            thisT.dmove((thisX, tickSeparation/2))
-            thisT = c << crossForDicing 
-            thisT.dmove((thisX, -tickSeparation/2))
-        for thisY in lanesY:
-            thisT = c << crossForDicing 
-            thisT.dmove((tickSeparation/2, thisY))
-            thisT = c << crossForDicing 
-            thisT.dmove((-tickSeparation/2, thisY))
+        xPitch = _regular_pitch(lanesX)
+        if xPitch is not None:
+            crosses = c.add_ref(crossForDicing, columns = xPitch[2], rows = 2, 
+                                spacing = (xPitch[1], tickSeparation))
+            crosses.dmove((xPitch[0], -tickSeparation/2))
+        else:
+            for thisX in lanesX:
+                thisT = c << crossForDicing 
+                thisT.dmove((thisX, tickSeparation/2))
+                thisT = c << crossForDicing 
+                thisT.dmove((thisX, -tickSeparation/2))
+        yPitch = _regular_pitch(lanesY)
+        if yPitch is not None:
+            crosses = c.add_ref(crossForDicing, columns = 2, rows = yPitch[2], 
+                                spacing = (tickSeparation, yPitch[1]))
+            crosses.dmove((-tickSeparation/2, yPitch[0]))
+        else:
+            for thisY in lanesY:
+                thisT = c << crossForDicing 
+                thisT.dmove((tickSeparation/2, thisY))
+                thisT = c << crossForDicing 
+                thisT.dmove((-tickSeparation/2, thisY))
     
     if(doBosch):
-        for thisX in lanesX:
-            thisR = c << gf.components.rectangle(
-                size = (boschWidth, boschLength), centered=True,
-                layer = boschLayer)
-            
-            thisR.dmove((thisX, 0))
-        for thisY in lanesY:
-            thisR = c << gf.components.rectangle(
-                size = (boschLength, boschWidth), centered=True,
-                layer = boschLayer)
-            thisR.dmove((0, thisY))
+        boxes = ([(thisX, 0, boschWidth, boschLength) for thisX in lanesX] 
+                 + [(0, thisY, boschLength, boschWidth) for thisY in lanesY])
+        c.shapes(layer_index(boschLayer, c)).insert(_merged_boxes(c, boxes))
     return c
 
 @gf.cell 
 def dicing_end_ticks(separation, laneWidth = DEFAULT_DICE_WIDTH, layer = LayerMapUNO.LABEL):
     c = gf.Component()
-    t1 = c << dicing_tick_single(layer = layer).drotate(90)
-    t1.dmove((separation/2, laneWidth/2))
-    t2 = c << dicing_tick_single(layer = layer).drotate(180)
-    t2.dmove((separation/2, -laneWidth/2))
-    t1 = c << dicing_tick_single(layer = layer).drotate(0)
-    t1.dmove((-separation/2, laneWidth/2))
-    t2 = c << dicing_tick_single(layer = layer).drotate(270)
-    t2.dmove((-separation/2, -laneWidth/2))
+    # four rotated references to one tick cell (rotate the references, never the cached cell)
+    tick = dicing_tick_single(layer = layer)
+    for angle, position in ((90, (separation/2, laneWidth/2)), 
+                            (180, (separation/2, -laneWidth/2)),
+                            (0, (-separation/2, laneWidth/2)),
+                            (270, (-separation/2, -laneWidth/2))):
+        thisT = c << tick
+        thisT.drotate(angle)
+        thisT.dmove(position)
     return c
 
 @gf.cell 
@@ -563,6 +747,68 @@ def fib_structures(thisWgWidth, thisGap, length = 100e0):
     # c << gf.components.text('FIB', size = 40, layer = LayerMapUNO.LABEL, position = (225, 25))
     return c
 
+# text, built from one cell per (character, size, layer) instead of one cell per string
+@gf.cell
+def glyph(character = "A", size = DEFAULT_TEXT_SIZE, layer = LayerMapUNO.LABEL):
+    # one character of gf.components.text's font, with its origin at the text origin
+    c = gf.Component()
+    scaling = size/1000
+    for poly in _glyph[ord(character)]:
+        c.add_polygon([(x*scaling, y*scaling) for x, y in poly], layer = layer)
+    return c
+
+def _glyph_extent(asciiVal):
+    # x extent of a glyph's polygons at size 1000
+    xs = [x for poly in _glyph[asciiVal] for x, _ in poly]
+    return min(xs), max(xs)
+
+def add_label(c, 
+              text, 
+              size = DEFAULT_TEXT_SIZE, 
+              layer = LayerMapUNO.LABEL, 
+              position = (0, 0), 
+              justify = "left", # left, right, center: as gf.components.text
+              rotation = 0): # degrees, about position
+    # add text to c as references to shared glyph cells. same result as adding
+    # gf.components.text(text, size, (0,0), justify, layer) rotated by rotation and moved to position,
+    # but the number of cells stays bounded by the number of distinct characters
+    scaling = size/1000
+    placement = gf.kdb.DCplxTrans(1, rotation, False, position[0], position[1])
+    refs = []
+    yOffset = 0e0
+    for line in text.split("\n"):
+        xOffset = 0e0
+        lineGlyphs = []
+        xMin, xMax = np.inf, -np.inf
+        for character in line:
+            asciiVal = ord(character)
+            if character == " ":
+                xOffset += 500*scaling
+            elif 33 <= asciiVal <= 126:
+                glyphMin, glyphMax = _glyph_extent(asciiVal)
+                xMin = min(xMin, xOffset + glyphMin*scaling)
+                xMax = max(xMax, xOffset + glyphMax*scaling)
+                lineGlyphs.append((character, xOffset))
+                xOffset += (_width[asciiVal] + _indent[asciiVal])*scaling
+            else:
+                raise Exception(f"No character with ascii value {asciiVal}!")
+        if len(lineGlyphs) > 0:
+            # justify on the line's polygon extent, like gf.components.text
+            if justify == "left":
+                shift = 0e0
+            elif justify == "right":
+                shift = -xMax
+            elif justify == "center":
+                shift = -(xMin + xMax)/2
+            else:
+                raise Exception("justify must be left, right or center!")
+            for character, x in lineGlyphs:
+                thisRef = c << glyph(character, size, layer)
+                thisRef.dcplx_trans = placement*gf.kdb.DCplxTrans(x + shift, yOffset)
+                refs.append(thisRef)
+        yOffset -= 1500*scaling
+    return refs
+
 # array of edge couplers for fiber arrays
 @gf.cell
 def edge_coupler_array(couplerComponent = None, 
@@ -596,15 +842,15 @@ def edge_coupler_pair(dxdy = Settings.DEFAULT_DXDY,
     c.add_port("o1", port = e1.ports["o2"], orientation = 0)
     c.add_port("o2", port = e2.ports["o2"], orientation = 90)
     if labelIn is not None:
-        c << gf.components.text(text = labelIn, size = Settings.DEFAULT_TEXT_SIZE, 
-                                position = (boschWidth, dy + 15e0),
-                                layer = LayerMapUNO.LABEL)
+        add_label(c, labelIn, size = Settings.DEFAULT_TEXT_SIZE, 
+                  position = (boschWidth, dy + 15e0),
+                  layer = LayerMapUNO.LABEL)
     if labelOut is not None:
-        ot = c << gf.components.text(text = labelOut, size = Settings.DEFAULT_TEXT_SIZE,
-                                layer = LayerMapUNO.LABEL,
-                                justify = "right")
-        ot.drotate(-90)
-        ot.dmove((dx + 15e0, boschWidth))
+        add_label(c, labelOut, size = Settings.DEFAULT_TEXT_SIZE,
+                  layer = LayerMapUNO.LABEL,
+                  position = (dx + 15e0, boschWidth),
+                  justify = "right",
+                  rotation = -90)
 
     return c
 
@@ -639,21 +885,20 @@ def edge_coupler_tri(dxdy = Settings.DEFAULT_DXDY,
         textPosition = (300e0,15e0)
     textPositionNp = np.array(textPosition)
     if labelIn is not None:
-        c << gf.components.text(text = labelIn, size = 40e0, 
-                                position = np.array((0,dy)) + textPositionNp,
-                                layer = LayerMapUNO.LABEL)
+        add_label(c, labelIn, size = 40e0, 
+                  position = np.array((0,dy)) + textPositionNp,
+                  layer = LayerMapUNO.LABEL)
     if labelOut is not None:
-        ot = c << gf.components.text(text = labelOut[0], size = 40e0,
-                                layer = LayerMapUNO.LABEL,
-                                justify = "right")
-        ot.drotate(-90)
-        ot.dmove(np.array((dx,0)) + np.flip(textPositionNp))
-        
-        ot = c << gf.components.text(text = labelOut[1], size = 40e0,
-                                layer = LayerMapUNO.LABEL,
-                                justify = "right")
-        ot.drotate(-90)
-        ot.dmove(np.array((dx + edgeSep,0)) + np.flip(textPositionNp))
+        add_label(c, labelOut[0], size = 40e0,
+                  layer = LayerMapUNO.LABEL,
+                  position = np.array((dx,0)) + np.flip(textPositionNp),
+                  justify = "right",
+                  rotation = -90)
+        add_label(c, labelOut[1], size = 40e0,
+                  layer = LayerMapUNO.LABEL,
+                  position = np.array((dx + edgeSep,0)) + np.flip(textPositionNp),
+                  justify = "right",
+                  rotation = -90)
     return c
 
 @gf.cell
@@ -669,9 +914,9 @@ def normal_mmi_with_sbend(wgWidth = 0.5e0):
                                             length_mmi = 5.5e0,
                                             width_mmi = 2.5e0,
                                             gap_mmi = 0.25e0)
-    s1 = c << gf.components.bend_s((30e0,10e0), cross_section = xs)
+    s1 = c << gf.components.bend_s((30e0,10e0), cross_section = xs, **bend_s_npoints((30e0,10e0), wgWidth))
     s1.connect('o1', mmiSplitter.ports['o2'])
-    s2 = c << gf.components.bend_s((30e0,-10e0), cross_section = xs)
+    s2 = c << gf.components.bend_s((30e0,-10e0), cross_section = xs, **bend_s_npoints((30e0,-10e0), wgWidth))
     s2.connect('o1', mmiSplitter.ports['o3'])
     
     c.add_port('o1', port = mmiSplitter.ports['o1'])
@@ -727,10 +972,12 @@ def y_splitter_adiabatic(w1 = Settings.DEFAULT_WG_WIDTH, g1 = 0.15e0, t1 = 0.15e
                                               linear=True)
     # cross section for escapes
     X3 = gf.CrossSection(sections=[gf.Section(width=w2, offset=0, layer=thisLayer)])
-    e1 = c << gf.components.bend_s(size = [escape, outSep/2 - endOffset], cross_section=X3)
+    e1 = c << gf.components.bend_s(size = (escape, outSep/2 - endOffset), cross_section=X3,
+                                   **bend_s_npoints((escape, outSep/2 - endOffset), w2))
     # we could try to fuss with ports but not worth it
     e1.dmove((length, endOffset))
-    e2 = c << gf.components.bend_s(size = [escape, -(outSep/2 - endOffset)], cross_section=X3)
+    e2 = c << gf.components.bend_s(size = (escape, -(outSep/2 - endOffset)), cross_section=X3,
+                                   **bend_s_npoints((escape, -(outSep/2 - endOffset)), w2))
     # we could try to fuss with ports but not worth it
     e2.dmove((length, -endOffset))
     # put one at the front for good measure
@@ -751,7 +998,7 @@ def timestamp(position = (0,0),
               designerLogoGdsHeight = 64e0):
     c = gf.Component()
     timestampTextSize = 50e0
-    timeStamp = c << gf.components.version_stamp(labels = [quadrantLabel], 
+    timeStamp = c << gf.components.version_stamp(labels = (quadrantLabel,), 
                                      with_qr_code=False, 
                                      layer=LayerMapUNO.LABEL, 
                                      pixel_size=1, text_size=timestampTextSize)
@@ -762,6 +1009,23 @@ def timestamp(position = (0,0),
     return c
 
 
+# merged logo polygons per (file, mtime), so each logo file is read once per session
+_LOGO_CACHE = {}
+
+def _logo_region(file):
+    # all polygons of a logo file's top cell (every layer), flattened and merged
+    key = (os.path.abspath(file), os.path.getmtime(file))
+    if key not in _LOGO_CACHE:
+        layout = gf.kdb.Layout()
+        layout.read(file)
+        topCell = layout.top_cell()
+        region = gf.kdb.Region()
+        for layerIdx in layout.layer_indexes():
+            region.insert(topCell.begin_shapes_rec(layerIdx))
+        region.merge()
+        _LOGO_CACHE[key] = (region, layout.dbu)
+    return _LOGO_CACHE[key]
+
 @gf.cell 
 def designer_logo(height = 75e0, # height when placed in layout
                   file = None, # file containing logo, assumed square
@@ -769,11 +1033,9 @@ def designer_logo(height = 75e0, # height when placed in layout
     # unique logo for designer to put alongside timestamp
     if file is None:
         raise Exception("No designer logo file supplied")
-    polygons = gf.read.import_gds(file).get_polygons()
-    scaledPoly = [height/gdsHeight*polygon for polygon in polygons]
+    region, fileDbu = _logo_region(file)
     c = gf.Component()
-    for thisPoly in scaledPoly:
-        
-        thisPoly
-        c.add_polygon(thisPoly, layer = LayerMapUNO.LABEL)
+    # one magnification for the whole region, including any dbu difference
+    scale = gf.kdb.ICplxTrans(height/gdsHeight*fileDbu/c.kcl.layout.dbu)
+    c.shapes(layer_index(LayerMapUNO.LABEL, c)).insert(region.transformed(scale))
     return c
\ No newline at end of file
@@ -0,0 +1,34 @@
+# times process emulation and permittivity rasterization on fib_structures cuts
+import time
+import numpy as np
+import uno_layout.components_wg as uno_wg
+from uno_layout.simulation import (emulate_process, labels_to_permittivity,
+                                   cross_section_permittivity)
+
+wgWidth = 0.8e0
+gap = 0.3e0
+c = uno_wg.fib_structures(wgWidth, gap)
+
+# one cut across all three structures (single wg at y = 0, 1 um wg at y = 50,
+# coupler at y = 100), halfway along them
+fullCut = ((0e0, -5e0), (0e0, 105e0))
+startTime = time.time()
+s, z, labels, names = emulate_process(c, fullCut)
+eps = labels_to_permittivity(labels, names)
+print(f"full cut: {labels.shape} grid, {names} in {time.time() - startTime:.2f} s")
+# cladding profile: top of the oxide at every s
+oxide = labels == names.index("sio2")
+cladTop = np.where(oxide.any(axis = -1), z[oxide.shape[-1] - 1 - np.argmax(oxide[:, ::-1], axis = -1)], np.nan)
+print(f"cladding top: {np.nanmin(cladTop):.3f} to {np.nanmax(cladTop):.3f} um")
+
+# coupler-gap sweep: many short cuts along the coupler
+numCuts = 1000
+xs = np.linspace(-45e0, 45e0, numCuts)
+gapCuts = np.stack([np.stack([xs, np.full(numCuts, 95e0)], axis = -1),
+                    np.stack([xs, np.full(numCuts, 105e0)], axis = -1)], axis = 1)
+startTime = time.time()
+s, z, labels, names = emulate_process(c, gapCuts)
+print(f"{numCuts} gap cuts, process emulation: {time.time() - startTime:.2f} s")
+startTime = time.time()
+s, z, eps = cross_section_permittivity(c, gapCuts)
+print(f"{numCuts} gap cuts, layer stack rasterization: {time.time() - startTime:.2f} s")
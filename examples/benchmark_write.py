@@ -0,0 +1,45 @@
+# compares file size and write time of the default write_gds against compressed
+# OASIS and GDS, and parallel per-block writes, on a die with fill and spirals
+import os
+import tempfile
+import time
+import gdsfactory as gf
+import uno_layout.components_wg as uno_wg
+from uno_layout.export import write_layout, write_blocks
+
+c = gf.Component()
+c << uno_wg.die_and_floorplan()
+for idx in range(4):
+    fill = c << uno_wg.random_fill_poisson(size = (500e0, 500e0), seed = idx)
+    fill.dmove((-4000e0 + 2100e0*idx, -4000e0))
+    spiral = c << uno_wg.spiral_delay_line(length = 2e4*(idx + 1))
+    spiral.dmove((-3000e0 + 2000e0*idx, 1000e0))
+for idx in range(200):
+    uno_wg.add_label(c, f"S{idx}", position = (-4000e0 + 40e0*idx, 3500e0))
+
+def report(name, paths, seconds):
+    size = sum(os.path.getsize(p) for p in paths)
+    print(f"{name:>24}: {size/1e6:8.2f} MB in {seconds:6.2f} s")
+
+def timed_write(name, tempDir, fileName, writer):
+    # GDS can't hold gdsfactory's generic layers (e.g. WAFER = 99999/0), so those rows
+    # may only report the error
+    path = os.path.join(tempDir, fileName)
+    startTime = time.time()
+    try:
+        writer(path)
+    except RuntimeError as e:
+        print(f"{name:>24}: failed, {str(e).split(',')[0]}")
+        return
+    report(name, [path], time.time() - startTime)
+
+with tempfile.TemporaryDirectory() as tempDir:
+    timed_write("write_gds", tempDir, "default.gds", c.write_gds)
+    for fileName in ("die.gds", "die.gds.gz", "die.oas"):
+        timed_write(f"write_layout {fileName}", tempDir, fileName, lambda path: write_layout(c, path))
+    timed_write("oas without cblocks", tempDir, "die_nocblocks.oas", 
+                lambda path: write_layout(c, path, cblocks = False))
+    for processes in (1, None):
+        startTime = time.time()
+        paths = write_blocks(c, os.path.join(tempDir, f"blocks{processes}"), processes = processes)
+        report(f"write_blocks ({processes or 'all'} proc)", paths, time.time() - startTime)
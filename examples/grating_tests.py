@@ -110,11 +110,11 @@ def full_chip():
     ts.dmove(dp2tuple(ts.dcenter), (-400,150))
     # labels
     y1 = 325
-    c << gf.components.text("TE", position = (-2000, y1), size = 50, layer = LAYERS.LABEL)
-    c << gf.components.text("TM", position = (-2000, -300), size = 50, layer = LAYERS.LABEL)
-    c << gf.components.text("20", position = (-1300, y1), size = 50, layer = LAYERS.LABEL)
-    c << gf.components.text("10", position = (-40, y1), size = 50, layer = LAYERS.LABEL)
-    c << gf.components.text("3", position = (1235, y1), size = 50, layer = LAYERS.LABEL)
+    uno_wg.add_label(c, "TE", position = (-2000, y1), size = 50, layer = LAYERS.LABEL)
+    uno_wg.add_label(c, "TM", position = (-2000, -300), size = 50, layer = LAYERS.LABEL)
+    uno_wg.add_label(c, "20", position = (-1300, y1), size = 50, layer = LAYERS.LABEL)
+    uno_wg.add_label(c, "10", position = (-40, y1), size = 50, layer = LAYERS.LABEL)
+    uno_wg.add_label(c, "3", position = (1235, y1), size = 50, layer = LAYERS.LABEL)
 
     # waveguides and cleave markers for FIB
     (c << uno_wg.fib_structures(globalWgWidth, 0.2, length = 600)).drotate(-90).dmove((-50,0))
@@ -125,7 +125,6 @@ def full_chip():
     
     return c
 
-@gf.cell
 def sixteen_grating_3_rings(gratingComponent,
                             thisWgWidth = 0.45e0,
                             numGratings = 16,
@@ -134,57 +133,21 @@ def sixteen_grating_3_rings(gratingComponent,
                             couplerLengths = [15e0, 20e0, 25e0],
                             ringLengths = [500e0, 600e0, 700e0],
                             loopback_spacing_to_grating = 50e0):
-    c = gf.Component()
-    waveguideXs = waveguide_xs(thisWgWidth)
-    gratingArray = c << gf.components.grating_coupler_array(
-        grating_coupler = gratingComponent,
-        n = numGratings, 
-        pitch = gratingPitch,
-        rotation = 90, 
-        with_loopback = False)
-
-    # loop back on ports 1-16    
-    loopback_y1 = gratingArray.dymin - loopback_spacing_to_grating
-    loopback_y2 = gratingArray.dymax + loopback_spacing_to_grating
-    gf.routing.route_single_from_steps(c,
-        gratingArray.ports["o0"], gratingArray.ports['o15'], 
-        steps = [
-        {"y": loopback_y1},
-        {"dx": -gratingPitch},
-        {"y": loopback_y2},
-        {"dx": (numGratings+1)*gratingPitch},
-        {"y": loopback_y1},
-        {"dx": -gratingPitch}
-        ])#,
-        #cross_section = waveguideXs
-        #)
-    
-    
-    gf.routing.route_single(c,
-        gratingArray.ports["o7"], gratingArray.ports['o8'])#, cross_section = waveguideXs
-        #)
-    
-    # on a 16-port ring, room for 3 add-drop rings on (2,3,4,5), (6,7,10,11), (12,13,14,15)
-
-    
-    portsForHorizLoc = ['o3', 'o8', 'o13']
-    portMappings = [[('o1', 'o2'), ('o2', 'o4'), ('o3', 'o3'), ('o4', 'o1')],
-                          [('o5', 'o2'), ('o6', 'o4'), ('o9', 'o3'), ('o10', 'o1')],
-                          [('o11', 'o2'), ('o12', 'o4'), ('o13', 'o3'), ('o14', 'o1')]]
-    
-    for i in range(3):
-        thisRing = c << uno_wgd.gen_racetrack(numCouplers = 2,
-                            wgWidth = thisWgWidth,
-                            ringLength = ringLengths[i], 
-                            couplingLength = couplerLengths[i], 
-                            couplerDx = 30, 
-                            couplerDy = 10, 
-                            thisGap = couplerGaps[i], 
-                            includeHeater = False)
-        thisMiddlePort = portsForHorizLoc[i]
-        thisRing.dmove(dp2tuple(thisRing.dcenter), gratingArray.ports[thisMiddlePort].dcenter + np.array((-gratingPitch/2,-160)))
-        uno_tools.naive_multiport_route(c, gratingArray, thisRing,  portMappings[i], waveguideXs)
-    return c
+    # port mapping is (o2, o4, o3, o1) on each ring, in grating order
+    rings = tuple(uno_wgd.gen_racetrack(numCouplers = 2,
+                        wgWidth = thisWgWidth,
+                        ringLength = ringLengths[i], 
+                        couplingLength = couplerLengths[i], 
+                        couplerDx = 30, 
+                        couplerDy = 10, 
+                        thisGap = couplerGaps[i], 
+                        includeHeater = False) for i in range(3))
+    return uno_wgd.grating_array_test(gratingComponent, rings,
+                                      numGratings = numGratings,
+                                      gratingPitch = gratingPitch,
+                                      dutPortOrders = (("o2", "o4", "o3", "o1"),)*3,
+                                      loopback_spacing_to_grating = loopback_spacing_to_grating,
+                                      wgWidth = thisWgWidth)
 
 @gf.cell
 def our_grating_TE(wgWidth):
@@ -0,0 +1,32 @@
+# vertex savings of the max-sagitta curve tolerance on a full example die, against
+# gdsfactory's default point counts
+import gdsfactory as gf
+import uno_layout.components_wg as uno_wg
+import uno_layout.common_wg_devices as uno_wgd
+import uno_layout.awg as uno_awg
+from uno_layout import Settings
+from uno_layout.extraction import curve_vertex_report
+
+def full_die(withFill = True):
+    # die with the curve-heavy generators: spirals, racetracks, an AWG slab, adiabatic
+    # splitters and a block of circle-post fill
+    c = gf.Component()
+    c << uno_wg.die_and_floorplan()
+    for idx in range(4):
+        spiral = c << uno_wg.spiral_delay_line(length = 1e4*(idx + 1))
+        spiral.dmove((-4000e0 + 2000e0*idx, 2500e0))
+        ring = c << uno_wgd.gen_racetrack(numCouplers = 2, ringLength = 500e0 + 100e0*idx, 
+                                          includeHeater = False)
+        ring.dmove((-3500e0 + 2000e0*idx, 0e0))
+        splitter = c << uno_wg.y_splitter_adiabatic()
+        splitter.dmove((-3500e0 + 2000e0*idx, -1000e0))
+    (c << uno_awg.rowland_fsp(n_array = 31)).dmove((0e0, -2000e0))
+    if withFill:
+        (c << uno_wg.random_fill_poisson(size = (500e0, 500e0))).dmove((-250e0, -4000e0))
+    return c
+
+# the fill's circle posts dominate the count, so the die is reported with and without it
+tolerances = (None, Settings.DEFAULT_MAX_SAGITTA, 5e-3)
+for withFill in (True, False):
+    print(f"full die {'with' if withFill else 'without'} fill")
+    results = curve_vertex_report(full_die, {"withFill": withFill}, tolerances)
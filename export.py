@@ -0,0 +1,347 @@
+# exporting layouts to other formats (3D meshes, compressed/split OASIS and GDS)
+# without flattening them
+
+
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import gdsfactory as gf
+import numpy as np
+from gdsfactory.technology import LogicalLayer
+from uno_layout import Settings, LayerMapUNO, layer_index
+from uno_layout.layer_stack import LAYER_STACK
+LAYERS = LayerMapUNO
+
+# RGBA colors of stack materials in 3D exports
+MATERIAL_COLORS = {
+    "si": (0.5, 0.5, 0.55, 1.0),
+    "sio2": (0.7, 0.85, 1.0, 0.3),
+    "si3n4": (0.2, 0.7, 0.3, 1.0),
+}
+DEFAULT_MATERIAL_COLOR = (0.8, 0.6, 0.2, 1.0)
+DEFAULT_OASIS_COMPRESSION = 2 # klayout's shape compression level, 0-10
+
+# layout shared with forked writer processes (copy-on-write, never pickled)
+_WRITE_LAYOUT = None
+
+
+def _trans_matrix(trans, dx = 0e0, dy = 0e0):
+    # column-major 4x4 glTF matrix of a DCplxTrans, followed by a (dx, dy) shift
+    angle = np.radians(trans.angle)
+    flip = -1 if trans.is_mirror() else 1
+    m = trans.mag
+    return [m*np.cos(angle), m*np.sin(angle), 0, 0,
+            -flip*m*np.sin(angle), flip*m*np.cos(angle), 0, 0,
+            0, 0, 1, 0,
+            trans.disp.x + dx, trans.disp.y + dy, 0, 1]
+
+def _triangulate(region, dbu, z):
+    # cap triangles of a region at height z: trapezoid decomposition, then fans
+    positions = []
+    indices = []
+    for thisPoly in region.each():
+        for trap in thisPoly.decompose_trapezoids():
+            points = [(p.x*dbu, p.y*dbu, z) for p in trap.each_point()]
+            start = len(positions)
+            positions += points
+            indices += [(start, start + k, start + k + 1) for k in range(1, len(points) - 1)]
+    return positions, indices
+
+def _sidewalls(region, dbu, zBottom, zTop, offsetBottom, offsetTop):
+    # quads along every contour (hulls and holes) of region, with the contour moved
+    # outward by offsetBottom/offsetTop (um) at the bottom/top for sidewall angles
+    positions = []
+    indices = []
+    for thisPoly in region.each():
+        contours = [thisPoly.each_point_hull()] + [thisPoly.each_point_hole(h) for h in range(thisPoly.holes())]
+        for contour in contours:
+            v = dbu*np.array([(p.x, p.y) for p in contour], dtype = float)
+            n = len(v)
+            if n < 3:
+                continue
+            edges = np.roll(v, -1, axis = 0) - v
+            # klayout hulls are clockwise and holes counterclockwise, so the left
+            # normal always points away from the material
+            normals = np.stack((-edges[:, 1], edges[:, 0]), axis = -1)/np.linalg.norm(edges, axis = -1)[:, None]
+            prevNormals = np.roll(normals, 1, axis = 0)
+            miter = (prevNormals + normals)/(1 + np.sum(prevNormals*normals, axis = -1))[:, None]
+            bottom = v + offsetBottom*miter
+            top = v + offsetTop*miter
+            start = len(positions)
+            positions += [(x, y, zBottom) for x, y in bottom] + [(x, y, zTop) for x, y in top]
+            for k in range(n):
+                k1 = (k + 1) % n
+                indices += [(start + k, start + k1, start + n + k1),
+                            (start + k, start + n + k1, start + n + k)]
+    return positions, indices
+
+def _extrude_level(region, dbu, level):
+    # triangle mesh of one layer level of one cell's own shapes
+    tanAngle = np.tan(np.radians(level.sidewall_angle))
+    offsetBottom = level.width_to_z*level.thickness*tanAngle
+    offsetTop = -(1 - level.width_to_z)*level.thickness*tanAngle
+    zBottom = level.zmin
+    zTop = level.zmin + level.thickness
+    positions = []
+    indices = []
+    for thisPositions, thisIndices in (
+            _triangulate(region.sized(int(round(offsetBottom/dbu))), dbu, zBottom),
+            _triangulate(region.sized(int(round(offsetTop/dbu))), dbu, zTop),
+            _sidewalls(region, dbu, zBottom, zTop, offsetBottom, offsetTop)):
+        indices += [(a + len(positions), b + len(positions), c + len(positions))
+                    for a, b, c in thisIndices]
+        positions += thisPositions
+    return np.array(positions, dtype = np.float32), np.array(indices, dtype = np.uint32)
+
+def export_gltf(componentIn, filename, layerStack = LAYER_STACK):
+    # extrude componentIn with layerStack into a glTF scene (filename.gltf + filename.bin).
+    # every unique cell is extruded once, straight into the binary buffer, and every
+    # instance (and array element) becomes a node with a transform pointing at its cell's mesh,
+    # so memory is bounded by the largest unique cell, not the flattened layout.
+    # levels on WAFER (blanket films), derived levels and air are skipped. units are um, z up
+    base, _ = os.path.splitext(filename)
+    binName = base + ".bin"
+    layout = componentIn.kcl.layout
+    dbu = layout.dbu
+    levels = []
+    for name, level in layerStack.layers.items():
+        if not isinstance(level.layer, LogicalLayer):
+            print(f"Warning: skipping derived level {name}")
+        elif gf.get_layer(level.layer.layer) != gf.get_layer(LAYERS.WAFER) and level.material != "air":
+            levels.append((gf.get_layer(level.layer.layer), level))
+
+    gltf = {"asset": {"version": "2.0", "generator": "uno_layout"},
+            "buffers": [], "bufferViews": [], "accessors": [],
+            "materials": [], "meshes": [], "nodes": []}
+    materialIds = {}
+    def material(name):
+        if name not in materialIds:
+            color = MATERIAL_COLORS.get(name, DEFAULT_MATERIAL_COLOR)
+            materialIds[name] = len(gltf["materials"])
+            gltf["materials"].append({"name": name, "doubleSided": True,
+                                      "alphaMode": "BLEND" if color[3] < 1 else "OPAQUE",
+                                      "pbrMetallicRoughness": {"baseColorFactor": list(color)}})
+        return materialIds[name]
+
+    meshIds = {}
+    with open(binName, "wb") as binFile:
+        def write(array, target):
+            # append array to the buffer (4-byte aligned) and return its bufferView
+            offset = binFile.tell()
+            binFile.write(array.tobytes())
+            binFile.write(b"\0"*(-binFile.tell() % 4))
+            gltf["bufferViews"].append({"buffer": 0, "byteOffset": offset,
+                                        "byteLength": array.nbytes, "target": target})
+            return len(gltf["bufferViews"]) - 1
+        # every unique cell once
+        for cellIdx in list(componentIn.called_cells()) + [componentIn.cell_index()]:
+            thisCell = layout.cell(cellIdx)
+            primitives = []
+            for layerIdx, level in levels:
+                region = gf.kdb.Region(thisCell.shapes(layerIdx))
+                if region.is_empty():
+                    continue
+                region.merge()
+                positions, indices = _extrude_level(region, dbu, level)
+                if len(indices) == 0:
+                    continue
+                gltf["accessors"].append({"bufferView": write(positions, 34962), "componentType": 5126,
+                                          "count": len(positions), "type": "VEC3",
+                                          "min": positions.min(axis = 0).tolist(),
+                                          "max": positions.max(axis = 0).tolist()})
+                gltf["accessors"].append({"bufferView": write(indices.ravel(), 34963), "componentType": 5125,
+                                          "count": indices.size, "type": "SCALAR"})
+                primitives.append({"attributes": {"POSITION": len(gltf["accessors"]) - 2},
+                                   "indices": len(gltf["accessors"]) - 1,
+                                   "material": material(level.material)})
+            if len(primitives) > 0:
+                meshIds[cellIdx] = len(gltf["meshes"])
+                gltf["meshes"].append({"name": thisCell.name, "primitives": primitives})
+        byteLength = binFile.tell()
+    gltf["buffers"].append({"uri": os.path.basename(binName), "byteLength": byteLength})
+
+    # cells that (somewhere below them) have geometry, so empty subtrees get no nodes
+    hasGeometry = {}
+    def has_geometry(cellIdx):
+        if cellIdx not in hasGeometry:
+            hasGeometry[cellIdx] = cellIdx in meshIds or any(
+                has_geometry(inst.cell_index) for inst in layout.cell(cellIdx).each_inst())
+        return hasGeometry[cellIdx]
+
+    def add_node(cellIdx, matrix):
+        # glTF nodes form a tree, so every placement gets its own (small) node
+        nodeIdx = len(gltf["nodes"])
+        node = {"name": layout.cell(cellIdx).name, "matrix": matrix}
+        gltf["nodes"].append(node)
+        if cellIdx in meshIds:
+            node["mesh"] = meshIds[cellIdx]
+        children = []
+        for inst in layout.cell(cellIdx).each_inst():
+            if not has_geometry(inst.cell_index):
+                continue
+            for ia in range(max(inst.na, 1) if inst.is_regular_array() else 1):
+                for ib in range(max(inst.nb, 1) if inst.is_regular_array() else 1):
+                    shift = ia*inst.da + ib*inst.db if inst.is_regular_array() else gf.kdb.DVector()
+                    children.append(add_node(inst.cell_index, _trans_matrix(inst.dcplx_trans, shift.x, shift.y)))
+        if len(children) > 0:
+            node["children"] = children
+        return nodeIdx
+
+    # root: z up (layout) to y up (glTF)
+    root = len(gltf["nodes"])
+    gltf["nodes"].append({"name": "root", "matrix": [1, 0, 0, 0, 0, 0, -1, 0, 0, 1, 0, 0, 0, 0, 0, 1]})
+    gltf["nodes"][root]["children"] = [add_node(componentIn.cell_index(), _trans_matrix(gf.kdb.DCplxTrans()))]
+    gltf["scenes"] = [{"nodes": [root]}]
+    gltf["scene"] = 0
+    with open(base + ".gltf", "w") as f:
+        json.dump(gltf, f)
+    return base + ".gltf"
+
+def save_options(filename,
+                 compressionLevel = DEFAULT_OASIS_COMPRESSION,
+                 cblocks = True, # zlib-compressed OASIS cell blocks
+                 strict = True): # OASIS strict mode (name tables, readable by every reader)
+    # klayout save options, format from filename (.oas, .gds, .gds.gz)
+    opt = gf.kdb.SaveLayoutOptions()
+    opt.set_format_from_filename(filename)
+    opt.oasis_compression_level = compressionLevel
+    opt.oasis_write_cblocks = cblocks
+    opt.oasis_strict_mode = strict
+    return opt
+
+def write_layout(componentIn, filename, 
+                 compressionLevel = DEFAULT_OASIS_COMPRESSION, cblocks = True, strict = True):
+    # write componentIn and its hierarchy, every unique cell once and streamed straight
+    # from the layout, as OASIS (CBLOCK compressed) or GDS (.gds.gz for gzip)
+    opt = save_options(filename, compressionLevel, cblocks, strict)
+    if opt.format == "GDS2":
+        # GDS can't number layers above 65535 (e.g. gdsfactory's WAFER = 99999/0), so
+        # leave them out when componentIn has nothing on them
+        layout = componentIn.kcl.layout
+        opt.deselect_all_layers()
+        for layerIdx in layout.layer_indexes():
+            info = layout.get_info(layerIdx)
+            if max(info.layer, info.datatype) <= 65535 or not componentIn.begin_shapes_rec(layerIdx).at_end():
+                opt.add_layer(layerIdx, info)
+    componentIn._kdb_cell.write(filename, opt)
+    return filename
+
+def _write_cells(filename, cellIndices, withChildren, optionArgs, layerIndices = None):
+    # writer job on _WRITE_LAYOUT: cellIndices with (or without) their child cells,
+    # restricted to layerIndices if given. instances of cells that are not written are dropped
+    opt = save_options(filename, *optionArgs)
+    opt.clear_cells()
+    for cellIdx in cellIndices:
+        if withChildren:
+            opt.add_cell(cellIdx)
+        else:
+            opt.add_this_cell(cellIdx)
+    if layerIndices is not None:
+        opt.deselect_all_layers()
+        for layerIdx in layerIndices:
+            opt.add_layer(layerIdx, _WRITE_LAYOUT.get_info(layerIdx))
+    _WRITE_LAYOUT.write(filename, opt)
+    return filename
+
+def _write_top(filename, cellIdx, optionArgs):
+    # writer job on _WRITE_LAYOUT: cellIdx's own shapes and instances, with the instanced
+    # cells as empty stubs of the same name (klayout's keep_instances is GDS only), so
+    # reading the block files on top fills them in
+    source = _WRITE_LAYOUT.cell(cellIdx)
+    layout = gf.kdb.Layout()
+    layout.dbu = _WRITE_LAYOUT.dbu
+    top = layout.create_cell(source.name)
+    for layerIdx in _WRITE_LAYOUT.layer_indexes():
+        top.shapes(layout.layer(_WRITE_LAYOUT.get_info(layerIdx))).insert(source.shapes(layerIdx))
+    stubs = {}
+    for inst in source.each_inst():
+        if inst.cell_index not in stubs:
+            stubs[inst.cell_index] = layout.create_cell(inst.cell.name).cell_index()
+        thisArray = inst.cell_inst.dup()
+        thisArray.cell_index = stubs[inst.cell_index]
+        top.insert(thisArray, layout.properties_id(_WRITE_LAYOUT.properties(inst.prop_id)))
+    layout.write(filename, save_options(filename, *optionArgs))
+    return filename
+
+def _write_concurrent(layout, jobs, processes = None):
+    # run (function, args) writer jobs on layout in forked processes, which share the
+    # layout copy-on-write. falls back to writing one by one where fork is unavailable
+    global _WRITE_LAYOUT
+    _WRITE_LAYOUT = layout
+    try:
+        processes = Settings.DEFAULT_THREADS if processes is None else processes
+        if processes == 1 or "fork" not in multiprocessing.get_all_start_methods():
+            return [function(*args) for function, args in jobs]
+        with concurrent.futures.ProcessPoolExecutor(max_workers = processes, 
+                                                    mp_context = multiprocessing.get_context("fork")) as pool:
+            futures = [pool.submit(function, *args) for function, args in jobs]
+            return [f.result() for f in futures]
+    finally:
+        _WRITE_LAYOUT = None
+
+def write_blocks(componentIn, directory, 
+                 fileFormat = "oas", # oas, gds or gds.gz
+                 compressionLevel = DEFAULT_OASIS_COMPRESSION, cblocks = True, strict = True,
+                 processes = None):
+    # write every top-level block of componentIn (the cell of each of its instances)
+    # with its hierarchy to its own file, in parallel, plus a top file holding only
+    # componentIn's own shapes and instances (of empty block cells). reading all files
+    # into one layout restores the full design (cells are matched by name).
+    # returns the written paths, top file first
+    os.makedirs(directory, exist_ok = True)
+    layout = componentIn.kcl.layout
+    optionArgs = (compressionLevel, cblocks, strict)
+    blocks = list(dict.fromkeys(inst.cell_index for inst in componentIn._kdb_cell.each_inst()))
+    jobs = [(_write_top, (os.path.join(directory, f"{componentIn.name}.{fileFormat}"),
+                          componentIn.cell_index(), optionArgs))]
+    jobs += [(_write_cells, (os.path.join(directory, f"{layout.cell(cellIdx).name}.{fileFormat}"),
+                             [cellIdx], True, optionArgs)) for cellIdx in blocks]
+    return _write_concurrent(layout, jobs, processes)
+
+def _cell_layers(componentIn):
+    # {cellIdx: set of layer indices in the cell or anywhere below it} for componentIn's
+    # hierarchy, from one bottom-up pass over the layout
+    layout = componentIn.kcl.layout
+    inTree = set(componentIn.called_cells()) | {componentIn.cell_index()}
+    layerIndices = list(layout.layer_indexes())
+    cellLayers = {}
+    for cellIdx in layout.each_cell_bottom_up():
+        if cellIdx not in inTree:
+            continue
+        thisCell = layout.cell(cellIdx)
+        layers = {li for li in layerIndices if not thisCell.shapes(li).is_empty()}
+        for childIdx in thisCell.each_child_cell():
+            layers |= cellLayers[childIdx]
+        cellLayers[cellIdx] = layers
+    return cellLayers
+
+def write_layer_split(componentIn, directory,
+                      layerGroups = None, # {fileName: [layers]}, one file per LayerMapUNO layer if None
+                      fileFormat = "oas", # oas, gds or gds.gz
+                      compressionLevel = DEFAULT_OASIS_COMPRESSION, cblocks = True, strict = True,
+                      processes = None):
+    # one file per layer group of componentIn (e.g. WG + LABEL at different e-beam
+    # resolutions, HEATER, ROUTING and PAD for their own process steps), from a single
+    # build. each file only holds the cells that contain its layers somewhere in their
+    # hierarchy, and the files are written concurrently.
+    # returns {fileName: path}, groups with no shapes are skipped
+    os.makedirs(directory, exist_ok = True)
+    layout = componentIn.kcl.layout
+    if layerGroups is None:
+        layerGroups = {name: [layer] for name, layer in vars(LayerMapUNO).items() 
+                       if isinstance(layer, tuple)}
+    cellLayers = _cell_layers(componentIn)
+    optionArgs = (compressionLevel, cblocks, strict)
+    names = []
+    jobs = []
+    for name, layers in layerGroups.items():
+        groupIndices = {layer_index(layer, componentIn) for layer in layers}
+        cells = [cellIdx for cellIdx, thisLayers in cellLayers.items() if thisLayers & groupIndices]
+        if len(cells) == 0:
+            print(f"Warning: no shapes on {name}, skipping it")
+            continue
+        names.append(name)
+        jobs.append((_write_cells, (os.path.join(directory, f"{componentIn.name}_{name}.{fileFormat}"),
+                                    cells, False, optionArgs, sorted(groupIndices))))
+    return dict(zip(names, _write_concurrent(layout, jobs, processes)))
@@ -0,0 +1,297 @@
+# functions for extracting lengths and other figures of merit from built components
+# without measuring polygons
+
+
+import gdsfactory as gf
+import numpy as np
+import scipy.sparse
+import scipy.sparse.csgraph
+from uno_layout import Settings, LayerMapUNO, layer_index
+LAYERS = LayerMapUNO
+
+# stand-in for zero-length connections, scipy's sparse graphs drop explicit zeros
+_ZERO_LENGTH = 1e-9
+
+
+def _cell_port_lengths(componentIn, portType, cache):
+    # optical path length (um) between every pair of componentIn's own ports
+    # returns (portNames, lengthMatrix), unconnected pairs are np.inf
+    # results are cached per cell name, so each unique cell is only solved once
+    if componentIn.name in cache:
+        return cache[componentIn.name]
+    ports = [p for p in componentIn.ports if p.port_type == portType]
+    portNames = [p.name for p in ports]
+    numPorts = len(ports)
+
+    if numPorts == 2 and "length" in componentIn.info:
+        # straights, bends, tapers, bend_s, and anything that already knows its
+        # length (e.g. spirals, generic_2port)
+        thisLength = float(componentIn.info["length"])
+        lengths = np.array([[0e0, thisLength], [thisLength, 0e0]])
+    elif len(componentIn.insts) == 0:
+        # leaf cell with no length information (flattened couplers etc.):
+        # fall back to the straight-line distance between ports
+        centers = np.array([p.dcenter for p in ports]).reshape(-1, 2)
+        lengths = np.linalg.norm(centers[:, None, :] - centers[None, :, :], axis = -1)
+    else:
+        lengths = _hierarchy_port_lengths(componentIn, ports, portType, cache)
+    cache[componentIn.name] = (portNames, lengths)
+    return portNames, lengths
+
+def _hierarchy_port_lengths(componentIn, ports, portType, cache):
+    # graph whose nodes are port locations: instance ports that touch share a node,
+    # and each instance adds edges between its own ports with its solved lengths
+    nodeIds = {}
+    def node(port):
+        return nodeIds.setdefault(port.center, len(nodeIds))
+    edges = {}
+    for inst in componentIn.insts:
+        childNames, childLengths = _cell_port_lengths(inst.cell, portType, cache)
+        if len(childNames) < 2:
+            continue
+        allPorts = list(inst.ports) # every array element, in cell port order
+        numCellPorts = len(inst.cell.ports)
+        for start in range(0, len(allPorts), numCellPorts):
+            byName = {p.name: p for p in allPorts[start:start + numCellPorts]}
+            childNodes = [node(byName[name]) for name in childNames]
+            for i in range(len(childNames)):
+                for j in range(i + 1, len(childNames)):
+                    if not np.isfinite(childLengths[i, j]) or childNodes[i] == childNodes[j]:
+                        continue
+                    key = (min(childNodes[i], childNodes[j]), max(childNodes[i], childNodes[j]))
+                    edges[key] = min(edges.get(key, np.inf),
+                                     max(childLengths[i, j], _ZERO_LENGTH))
+
+    numPorts = len(ports)
+    lengths = np.full((numPorts, numPorts), np.inf)
+    np.fill_diagonal(lengths, 0e0)
+    topNodes = [nodeIds.get(p.center) for p in ports]
+    if len(edges) == 0:
+        return lengths
+    edgeKeys = np.array(list(edges.keys()))
+    graph = scipy.sparse.coo_matrix(
+        (np.array(list(edges.values())), (edgeKeys[:, 0], edgeKeys[:, 1])),
+        shape = (len(nodeIds), len(nodeIds))).tocsr()
+    connected = [i for i, n in enumerate(topNodes) if n is not None]
+    if len(connected) == 0:
+        return lengths
+    # one dijkstra call from all top-level ports at once
+    distances = scipy.sparse.csgraph.dijkstra(graph, directed = False,
+                                              indices = [topNodes[i] for i in connected])
+    for row, i in enumerate(connected):
+        for j in connected:
+            lengths[i, j] = distances[row, topNodes[j]]
+    np.fill_diagonal(lengths, 0e0)
+    # undo the stand-in for zero-length connections
+    lengths[lengths < 1e3*_ZERO_LENGTH] = 0e0
+    return lengths
+
+def port_lengths(componentIn, portType = "optical"):
+    # optical path length (um) between every connected pair of componentIn's ports,
+    # as {(port1, port2): length}. lengths come from the info["length"] of routes'
+    # straights/bends and other cells, solved once per unique cell
+    portNames, lengths = _cell_port_lengths(componentIn, portType, {})
+    return {(portNames[i], portNames[j]): float(lengths[i, j])
+            for i in range(len(portNames)) for j in range(i + 1, len(portNames))
+            if np.isfinite(lengths[i, j])}
+
+def structure_lengths(dieComponent, portType = "optical"):
+    # port_lengths of every top-level structure on a die, keyed by instance name,
+    # e.g. to feed cutback/delay-line loss fits. unique cells are only solved once
+    cache = {}
+    results = {}
+    for inst in dieComponent.insts:
+        portNames, lengths = _cell_port_lengths(inst.cell, portType, cache)
+        results[inst.name] = {(portNames[i], portNames[j]): float(lengths[i, j])
+                              for i in range(len(portNames))
+                              for j in range(i + 1, len(portNames))
+                              if np.isfinite(lengths[i, j])}
+    return results
+
+def _flat_region(componentIn, layer):
+    # merged, flattened region of one layer of componentIn
+    region = gf.kdb.Region(componentIn.begin_shapes_rec(layer_index(layer, componentIn)))
+    region.merge()
+    return region
+
+def _region_squares(region, dbu):
+    # number of squares of every polygon in region, treating each as an unbranched
+    # strip of uniform width w and length L: A = L*w, P = 2*(L + w), so
+    # w = (P - sqrt(P^2 - 16*A))/4 and squares = A/w^2. exact for straight and curved
+    # strips (ring heaters, leads), a good approximation for tapers and corners
+    areas = dbu**2*np.array([p.area() for p in region.each()], dtype = float)
+    perimeters = dbu*np.array([p.perimeter() for p in region.each()], dtype = float)
+    widths = (perimeters - np.sqrt(np.maximum(perimeters**2 - 16*areas, 0e0)))/4
+    return np.divide(areas, widths**2, out = np.zeros_like(areas), where = widths > 0)
+
+def heater_resistances(componentIn,
+                       heaterSheetRes = Settings.DEFAULT_HEATER_SHEET_RES, # ohm/sq
+                       routingSheetRes = Settings.DEFAULT_ROUTING_SHEET_RES, # ohm/sq
+                       heaterLayer = LAYERS.HEATER,
+                       routingLayer = LAYERS.ROUTING,
+                       padLayer = LAYERS.PAD):
+    # resistance of every HEATER/ROUTING net in componentIn, from its polygons.
+    # heater under routing is shorted by the routing, and routing pads (ROUTING
+    # polygons around PAD openings) are treated as ideal contacts. every net is
+    # assumed to be a single series path, as with snake heaters and ring heaters.
+    # returns a list of nets sorted by x then y, each a dict with the net's center,
+    # squares on each layer and resistances in ohm
+    dbu = componentIn.kcl.layout.dbu
+    heater = _flat_region(componentIn, heaterLayer)
+    routing = _flat_region(componentIn, routingLayer)
+    pads = _flat_region(componentIn, padLayer)
+    nets = (heater + routing).merged()
+    
+    heaterPieces = heater - routing
+    if not pads.is_empty():
+        # open the routing by half the smallest pad opening: keeps the pad metal,
+        # drops the (narrower) traces leading into it
+        padSizes = [min(p.bbox().width(), p.bbox().height()) for p in pads.each()]
+        openRadius = min(padSizes)//2
+        padMetal = routing.sized(-openRadius).sized(openRadius).interacting(pads)
+        routingPieces = routing - padMetal
+    else:
+        routingPieces = routing
+    results = []
+    for thisNet in nets.each():
+        netRegion = gf.kdb.Region(thisNet)
+        heaterSquares = _region_squares(heaterPieces.interacting(netRegion), dbu).sum()
+        routingSquares = _region_squares(routingPieces.interacting(netRegion), dbu).sum()
+        netCenter = thisNet.bbox().center()
+        results.append({"center": (dbu*netCenter.x, dbu*netCenter.y),
+                        "heater_squares": float(heaterSquares),
+                        "routing_squares": float(routingSquares),
+                        "heater_resistance": float(heaterSheetRes*heaterSquares),
+                        "routing_resistance": float(routingSheetRes*routingSquares),
+                        "resistance": float(heaterSheetRes*heaterSquares
+                                            + routingSheetRes*routingSquares)})
+    results.sort(key = lambda n: n["center"])
+    return results
+
+def _instance_counts(componentIn):
+    # {cellIdx: number of placements in the flattened componentIn}, from one top-down
+    # pass in which every instance (array) multiplies its parent's count
+    layout = componentIn.kcl.layout
+    counts = {componentIn.cell_index(): 1}
+    for cellIdx in layout.each_cell_top_down():
+        if cellIdx not in counts:
+            continue
+        for inst in layout.cell(cellIdx).each_inst():
+            numPlaced = inst.na*inst.nb if inst.is_regular_array() else 1
+            counts[inst.cell_index] = counts.get(inst.cell_index, 0) + counts[cellIdx]*numPlaced
+    return counts
+
+def _layer_names(layout):
+    # {layerIdx: LayerMapUNO name, or "layer/datatype" for other layers}
+    unoNames = {layer: name for name, layer in vars(LayerMapUNO).items() if isinstance(layer, tuple)}
+    names = {}
+    for layerIdx in layout.layer_indexes():
+        info = layout.get_info(layerIdx)
+        names[layerIdx] = unoNames.get((info.layer, info.datatype), f"{info.layer}/{info.datatype}")
+    return names
+
+def ebeam_write_time(componentIn,
+                     layers = None, # layers to estimate, every layer with shapes if None
+                     beamCurrent = Settings.DEFAULT_BEAM_CURRENT, # nA
+                     dose = Settings.DEFAULT_EBEAM_DOSE, # uC/cm^2, or {layer: dose}
+                     fieldSize = Settings.DEFAULT_FIELD_SIZE, # um
+                     maxShotSize = Settings.DEFAULT_MAX_SHOT_SIZE, # um
+                     shotTime = Settings.DEFAULT_SHOT_TIME, # s per shot
+                     fieldTime = Settings.DEFAULT_FIELD_TIME, # s per field
+                     numDominant = 10):
+    # e-beam write time estimate of componentIn without flattening it: exposed area,
+    # vertices and shots are counted once per unique cell (merged per cell) and
+    # multiplied by the cell's placement count. shots are the cell's trapezoids plus one
+    # per maxShotSize^2 of area, fields are the layer's bbox in fieldSize squares.
+    # time = dose*area/current + shots*shotTime + fields*fieldTime.
+    # returns {"layers": {name: stats}, "time": total s, "dominant": [(cell name, layer, s, fraction)]}
+    # with dominant listing the numDominant cells with the largest share of the exposure+shot time
+    layout = componentIn.kcl.layout
+    dbu = layout.dbu
+    counts = _instance_counts(componentIn)
+    names = _layer_names(layout)
+    if layers is None:
+        layerIndices = [li for li in layout.layer_indexes() if not componentIn._kdb_cell.bbox_per_layer(li).empty()]
+    else:
+        layerIndices = [layer_index(layer, componentIn) for layer in layers]
+    # s per um^2: uC/cm^2 -> C/um^2 is 1e-14, nA -> A is 1e-9
+    def seconds_per_area(layerIdx):
+        info = layout.get_info(layerIdx)
+        thisDose = dose.get((info.layer, info.datatype), Settings.DEFAULT_EBEAM_DOSE) if isinstance(dose, dict) else dose
+        return thisDose*1e-14/(beamCurrent*1e-9)
+
+    layerStats = {}
+    cellTimes = []
+    for layerIdx in layerIndices:
+        area = 0e0
+        vertices = 0
+        shots = 0e0
+        for cellIdx, count in counts.items():
+            region = gf.kdb.Region(layout.cell(cellIdx).shapes(layerIdx))
+            if region.is_empty():
+                continue
+            region.merge()
+            cellArea = dbu**2*region.area()
+            cellVertices = sum(p.num_points() for p in region.each())
+            cellShots = region.decompose_trapezoids_to_region().count() + cellArea/maxShotSize**2
+            area += count*cellArea
+            vertices += count*cellVertices
+            shots += count*cellShots
+            cellTimes.append((layout.cell(cellIdx).name, names[layerIdx],
+                              count*(cellArea*seconds_per_area(layerIdx) + cellShots*shotTime)))
+        box = componentIn._kdb_cell.dbbox_per_layer(layerIdx)
+        fields = int(np.ceil(box.width()/fieldSize)*np.ceil(box.height()/fieldSize)) if not box.empty() else 0
+        exposureTime = area*seconds_per_area(layerIdx)
+        layerStats[names[layerIdx]] = {"area": area, "vertices": vertices, "shots": int(round(shots)),
+                                       "fields": fields, "exposure_time": exposureTime,
+                                       "time": exposureTime + shots*shotTime + fields*fieldTime}
+    totalTime = sum(stats["time"] for stats in layerStats.values())
+    cellTimes.sort(key = lambda t: -t[2])
+    dominant = [(name, layerName, t, t/totalTime if totalTime > 0 else 0e0)
+                for name, layerName, t in cellTimes[:numDominant]]
+    return {"layers": layerStats, "time": totalTime, "dominant": dominant}
+
+def vertex_counts(componentIn):
+    # {layer name: (vertices stored in unique cells, vertices after flattening)},
+    # weighting each unique cell by its placement count instead of flattening
+    layout = componentIn.kcl.layout
+    counts = _instance_counts(componentIn)
+    names = _layer_names(layout)
+    results = {}
+    for layerIdx in layout.layer_indexes():
+        stored = 0
+        flat = 0
+        for cellIdx, count in counts.items():
+            cellVertices = sum(p.num_points() for p in gf.kdb.Region(layout.cell(cellIdx).shapes(layerIdx)).each())
+            stored += cellVertices
+            flat += count*cellVertices
+        if stored > 0:
+            results[names[layerIdx]] = (stored, flat)
+    return results
+
+def curve_vertex_report(buildFunction, # e.g. a full die
+                        kwargs = None,
+                        tolerances = (None, Settings.DEFAULT_MAX_SAGITTA)): # max sagitta (um), None for gdsfactory defaults
+    # vertex_counts of buildFunction(**kwargs) built with each Settings.DEFAULT_MAX_SAGITTA
+    # in tolerances, with the cell cache cleared between builds so every curve is regenerated.
+    # prints the flattened vertex count per layer against the first tolerance and
+    # returns {tolerance: vertex_counts}
+    kwargs = {} if kwargs is None else kwargs
+    savedTolerance = Settings.DEFAULT_MAX_SAGITTA
+    results = {}
+    try:
+        for tolerance in tolerances:
+            Settings.DEFAULT_MAX_SAGITTA = tolerance
+            gf.clear_cache()
+            results[tolerance] = vertex_counts(buildFunction(**kwargs))
+    finally:
+        Settings.DEFAULT_MAX_SAGITTA = savedTolerance
+        gf.clear_cache()
+    reference = results[tolerances[0]]
+    for tolerance in tolerances[1:]:
+        print(f"max sagitta {tolerance} vs {tolerances[0]}:")
+        for name, (stored, flat) in results[tolerance].items():
+            referenceFlat = reference.get(name, (0, 0))[1]
+            saving = 1 - flat/referenceFlat if referenceFlat > 0 else 0e0
+            print(f"  {name}: {flat} vertices ({referenceFlat} before, {100*saving:.1f}% saved)")
+    return results
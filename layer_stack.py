@@ -1,3 +1,5 @@
+import functools
+from pydantic import ConfigDict
 from uno_layout import LayerMapUNO as LAYERS
 from gdsfactory.technology import LayerLevel, LayerStack, LogicalLayer
 from gdsfactory.technology.processes import (
@@ -20,11 +22,55 @@ class LayerStackParameters:
     thickness_clad: float = 3.0
     substrate_thickness: float = 10.0
     box_thickness: float = 4.5
+    thickness_slab_deep_etch: float = 0.0 # strip waveguides, fully etched
     # undercut_thickness: float = 5.0
 
 
+def _level_key(level: LayerLevel) -> tuple:
+    """hashable summary of everything that defines a LayerLevel's geometry and material."""
+    zToBias = None if level.z_to_bias is None else tuple(map(tuple, level.z_to_bias))
+    return (level.layer, level.derived_layer, level.thickness, level.zmin,
+            level.sidewall_angle, level.width_to_z, zToBias, level.bias,
+            level.mesh_order, level.material)
+
+
+class FrozenLayerStack(LayerStack):
+    """LayerStack that can't be reassigned and hashes by its levels, so it can key caches.
+
+    Derived stacks (subset, with_materials, with_thickness) share the LayerLevels they
+    don't change, so treat levels as read-only (no z_offset/invert_zaxis in place).
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    def __hash__(self) -> int:
+        return hash(tuple((name, _level_key(level)) for name, level in self.layers.items()))
+
+    def subset(self, names) -> "FrozenLayerStack":
+        """stack with only the named levels, in the given order."""
+        return FrozenLayerStack(layers={k: self.layers[k] for k in names if k in self.layers})
+
+    def with_materials(self, **materials: str) -> "FrozenLayerStack":
+        """stack with the materials of the named levels replaced, e.g. with_materials(clad="sio2")."""
+        return self._with_updates({k: {"material": v} for k, v in materials.items()})
+
+    def with_thickness(self, **thicknesses: float) -> "FrozenLayerStack":
+        """stack with the thicknesses of the named levels replaced. zmin of other levels is unchanged."""
+        return self._with_updates({k: {"thickness": v} for k, v in thicknesses.items()})
+
+    def _with_updates(self, updates: dict[str, dict]) -> "FrozenLayerStack":
+        for name in updates:
+            if name not in self.layers:
+                raise Exception(f"No level named {name} in this LayerStack!")
+        return FrozenLayerStack(layers={
+            k: level.model_copy(update=updates[k]) if k in updates else level
+            for k, level in self.layers.items()})
+
+
+@functools.cache
 def get_layer_stack(
     # simple LayerStack for passive waveguide devices   
+    # memoized: identical arguments return the same (immutable) stack
         
     # thickness arguments
     thickness_wg: float = LayerStackParameters.thickness_wg,
@@ -70,7 +116,7 @@ def get_layer_stack(
     material_core: str = "si3n4",
     material_clad: str = "air"
     
-) -> LayerStack:
+) -> FrozenLayerStack:
 
     # thickness_deep_etch = thickness_wg - thickness_slab_deep_etch
     # thickness_shallow_etch = thickness_wg - thickness_slab_shallow_etch
@@ -108,22 +154,13 @@ def get_layer_stack(
         ),
     )
 
-    return LayerStack(layers=layers)
+    return FrozenLayerStack(layers=layers)
 
 
 LAYER_STACK = get_layer_stack()
 
 
-WAFER_STACK = LayerStack(
-    layers={
-        k: get_layer_stack().layers[k]
-        for k in (
-            "substrate",
-            "box",
-            "core",
-        )
-    }
-)
+WAFER_STACK = LAYER_STACK.subset(("substrate", "box", "core"))
 
 
 def get_process() -> tuple[ProcessStep, ...]:
@@ -134,7 +171,7 @@ def get_process() -> tuple[ProcessStep, ...]:
             #layers_or=[LAYER.SLAB90],
             depth=LayerStackParameters.thickness_wg
             + 0.01,  # slight overetch for numerics
-            material="silicon",
+            material="si3n4", # must match the core material of get_layer_stack
             resist_thickness=1.0,
             positive_tone=False,
         ),
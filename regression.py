@@ -0,0 +1,164 @@
+# geometry regression harness: builds generators with stored parameter sets and
+# compares them against golden OASIS files, with a tiled per-layer XOR where the
+# hierarchical content hashes differ
+
+
+import hashlib
+import json
+import os
+import gdsfactory as gf
+import klayout.rdb
+import uno_layout.components_wg as uno_wg
+import uno_layout.common_wg_devices as uno_devices
+import uno_layout.components_heater as uno_heater
+import uno_layout.awg as uno_awg
+from uno_layout import LayerMapUNO
+from uno_layout.tools import _tiling_processor
+from uno_layout.export import write_layout
+LAYERS = LayerMapUNO
+
+# {name: (factory, [kwargs, ...])}, every kwargs is checked as case "name_idx"
+REGRESSION_CASES = {
+    "coupler_asymmetric": (uno_wg.coupler_asymmetric, [{}, {"gap": 0.3, "dy": 5e0}]),
+    "asymmetric_coupler": (uno_wg.asymmetric_coupler, [{"couplerDx": 20e0}]),
+    "mode_filter": (uno_wg.mode_filter, [{}]),
+    "spiral_delay_line": (uno_wg.spiral_delay_line, [{"length": 5000e0}, {"length": 5000e0, "bend": "euler"}]),
+    "y_splitter_adiabatic": (uno_wg.y_splitter_adiabatic, [{}]),
+    "gen_racetrack": (uno_devices.gen_racetrack, [{"numCouplers": 1}, {"numCouplers": 2, "halfRingHeater": True}]),
+    "gen_coupler_racetrack_2ports": (uno_devices.gen_coupler_racetrack_2ports, [{}]),
+    "snake_heater": (uno_heater.snake_heater, [{}]),
+    "rowland_fsp": (uno_awg.rowland_fsp, [{}]),
+}
+HASH_FILE = "hashes.json"
+
+
+def _case_ids(cases):
+    # [(caseId, factory, kwargs)] for every stored parameter set
+    return [(f"{name}_{idx}", factory, kwargs)
+            for name, (factory, kwargsList) in cases.items()
+            for idx, kwargs in enumerate(kwargsList)]
+
+def _layer_key(layout, layerIdx):
+    info = layout.get_info(layerIdx)
+    return f"{info.layer}/{info.datatype}"
+
+def layer_hashes(componentIn):
+    # {"layer/datatype": hash} of componentIn's content on each layer. hashes are built
+    # bottom-up, each unique cell once: a cell's hash covers its own polygons and the
+    # (hash, transformation, array) of every instance with content on that layer
+    layout = componentIn.kcl.layout
+    inTree = set(componentIn.called_cells()) | {componentIn.cell_index()}
+    layerIndices = list(layout.layer_indexes())
+    hashes = {}
+    for cellIdx in layout.each_cell_bottom_up():
+        if cellIdx not in inTree:
+            continue
+        thisCell = layout.cell(cellIdx)
+        cellHashes = {}
+        for layerIdx in layerIndices:
+            items = sorted(str(p) for p in gf.kdb.Region(thisCell.shapes(layerIdx)).each())
+            for inst in thisCell.each_inst():
+                childHash = hashes[inst.cell_index].get(layerIdx)
+                if childHash is not None:
+                    items.append(f"{childHash} {inst.cplx_trans} {inst.a} {inst.b} {inst.na} {inst.nb}")
+            if len(items) > 0:
+                cellHashes[layerIdx] = hashlib.sha1("\n".join(sorted(items)).encode()).hexdigest()
+        hashes[cellIdx] = cellHashes
+    return {_layer_key(layout, layerIdx): thisHash
+            for layerIdx, thisHash in hashes[componentIn.cell_index()].items()}
+
+def write_golden(directory, cases = REGRESSION_CASES):
+    # build every case and store it as directory/caseId.oas, with its layer hashes in
+    # directory/hashes.json. run on a known-good tree before refactoring. OASIS rather
+    # than GDS because gdsfactory's generic layers (e.g. WAFER = 99999/0) don't fit in GDS
+    os.makedirs(directory, exist_ok = True)
+    allHashes = {}
+    for caseId, factory, kwargs in _case_ids(cases):
+        c = factory(**kwargs)
+        write_layout(c, os.path.join(directory, f"{caseId}.oas"))
+        allHashes[caseId] = layer_hashes(c)
+    with open(os.path.join(directory, HASH_FILE), "w") as f:
+        json.dump(allHashes, f, indent = 1)
+    return allHashes
+
+def _xor_layers(componentIn, golden, layerKeys, tileSize, threads):
+    # {layerKey: merged XOR region} of componentIn against the golden cell, all layers
+    # in one multithreaded tiling processor pass
+    layout = componentIn.kcl.layout
+    tp = _tiling_processor(componentIn, tileSize, 0, threads)
+    results = {}
+    script = []
+    for idx, layerKey in enumerate(layerKeys):
+        layer, datatype = (int(v) for v in layerKey.split("/"))
+        newIdx = layout.find_layer(layer, datatype)
+        goldenIdx = golden.layout().find_layer(layer, datatype)
+        terms = []
+        if newIdx is not None:
+            tp.input(f"a{idx}", componentIn.begin_shapes_rec(newIdx))
+            terms.append(f"a{idx}")
+        if goldenIdx is not None:
+            tp.input(f"b{idx}", golden.begin_shapes_rec(goldenIdx))
+            terms.append(f"b{idx}")
+        if len(terms) == 0:
+            continue
+        results[layerKey] = gf.kdb.Region()
+        tp.output(f"x{idx}", results[layerKey])
+        # _tile is nil when everything fits in one tile
+        xor = " ^ ".join(terms)
+        script.append(f"_output(x{idx}, _tile ? (({xor}) & _tile) : ({xor}))")
+    if len(script) > 0:
+        tp.queue("; ".join(script))
+        tp.execute("uno_layout regression xor")
+    for region in results.values():
+        region.merge()
+    return results
+
+def check_regression(directory, # golden files from write_golden
+                     cases = REGRESSION_CASES,
+                     markerFile = None, # .lyrdb for differences, directory/regression.lyrdb if None
+                     tileSize = None, # tiling processor settings, defaults from Settings
+                     threads = None):
+    # rebuild every case and compare it with its golden file. cases (and layers) whose
+    # content hash matches the golden one are skipped without touching geometry, the
+    # rest are XORed per layer; a hash change without an XOR difference means only the
+    # hierarchy changed. differences go to a KLayout marker database (one category per
+    # case and layer).
+    # returns {caseId: {"status": unchanged/equivalent/changed/missing, "layers": {layer: XOR area um^2}}}
+    markerFile = os.path.join(directory, "regression.lyrdb") if markerFile is None else markerFile
+    with open(os.path.join(directory, HASH_FILE)) as f:
+        goldenHashes = json.load(f)
+    rdb = klayout.rdb.ReportDatabase("uno_layout regression")
+    results = {}
+    for caseId, factory, kwargs in _case_ids(cases):
+        goldenPath = os.path.join(directory, f"{caseId}.oas")
+        if caseId not in goldenHashes or not os.path.exists(goldenPath):
+            results[caseId] = {"status": "missing", "layers": {}}
+            print(f"{caseId}: no golden file, run write_golden")
+            continue
+        c = factory(**kwargs)
+        newHashes = layer_hashes(c)
+        changedLayers = sorted(key for key in set(newHashes) | set(goldenHashes[caseId])
+                               if newHashes.get(key) != goldenHashes[caseId].get(key))
+        if len(changedLayers) == 0:
+            results[caseId] = {"status": "unchanged", "layers": {}}
+            continue
+        goldenLayout = gf.kdb.Layout()
+        goldenLayout.read(goldenPath)
+        if abs(goldenLayout.dbu - c.kcl.layout.dbu) > 1e-12:
+            raise Exception(f"{caseId}: golden dbu {goldenLayout.dbu} differs from {c.kcl.layout.dbu}!")
+        golden = goldenLayout.cell(c.name) or goldenLayout.top_cell()
+        xors = _xor_layers(c, golden, changedLayers, tileSize, threads)
+        dbu = c.kcl.layout.dbu
+        diffs = {key: dbu**2*region.area() for key, region in xors.items() if not region.is_empty()}
+        results[caseId] = {"status": "changed" if len(diffs) > 0 else "equivalent", "layers": diffs}
+        if len(diffs) > 0:
+            rdbCell = rdb.create_cell(caseId)
+            caseCategory = rdb.create_category(caseId)
+            for key in diffs:
+                layerCategory = rdb.create_category(caseCategory, key)
+                rdb.create_items(rdbCell.rdb_id(), layerCategory.rdb_id(), gf.kdb.CplxTrans(dbu), xors[key])
+            print(f"{caseId}: CHANGED on " + ", ".join(f"{k} ({a:.4g} um^2)" for k, a in diffs.items()))
+    rdb.save(markerFile)
+    numChanged = sum(r["status"] == "changed" for r in results.values())
+    print(f"{len(results)} cases, {numChanged} changed, markers in {markerFile}")
+    return results
@@ -0,0 +1,186 @@
+# stepping dies across a reticle/wafer and assembling multi-project submissions,
+# with per-site/per-quadrant content built in parallel worker processes
+
+
+import os
+import time
+import tempfile
+import concurrent.futures
+import gdsfactory as gf
+import numpy as np
+import uno_layout.components_wg as uno_wg
+from uno_layout import Settings, LayerMapUNO, layer_index
+from uno_layout.export import write_layout
+LAYERS = LayerMapUNO
+
+
+def _build_to_file(buildFunction, kwargs, path):
+    # worker: build one component and write it to path (OASIS, since gdsfactory's generic
+    # layers such as WAFER = 99999/0 don't fit in GDS), returns the build time (s)
+    startTime = time.perf_counter()
+    c = buildFunction(**kwargs)
+    buildTime = time.perf_counter() - startTime
+    write_layout(c, path)
+    return buildTime
+
+def _unique_name(layout, name):
+    candidate = name
+    idx = 1
+    while layout.has_cell(candidate):
+        candidate = f"{name}${idx}"
+        idx += 1
+    return candidate
+
+def _import_cell(sourceCell, name, prefix = ""):
+    # copy sourceCell (any layout) and its hierarchy into a new cell named name.
+    # every copied child cell gets prefix, and all names are made unique in this layout
+    imported = gf.Component()
+    layout = imported.kcl.layout
+    before = set(cell.cell_index() for cell in layout.each_cell())
+    imported.copy_tree(sourceCell)
+    for cellIdx in imported.called_cells():
+        if cellIdx not in before:
+            layout.cell(cellIdx).name = _unique_name(layout, prefix + layout.cell(cellIdx).name)
+    imported.name = _unique_name(layout, name)
+    return imported
+
+def build_parallel(buildFunction, kwargsList, names, processes = None, prefixes = None):
+    # buildFunction(**kwargs) for every kwargs in kwargsList, in worker processes when
+    # processes != 1 (each worker writes a temporary OASIS file that is read back here).
+    # buildFunction must be a module-level (picklable) function.
+    # returns (components, buildTimes): the built components imported into this layout,
+    # named by names, with their child cells renamed by prefixes (if given) so separately
+    # built designs never clash, and each build's time in s. buildFunction can also be a
+    # list with one function per build
+    numBuilds = len(kwargsList)
+    prefixes = [""]*numBuilds if prefixes is None else prefixes
+    buildFunctions = buildFunction if isinstance(buildFunction, (list, tuple)) else [buildFunction]*numBuilds
+    components = []
+    buildTimes = []
+    if processes == 1:
+        for thisFunction, kwargs, name, prefix in zip(buildFunctions, kwargsList, names, prefixes):
+            startTime = time.perf_counter()
+            built = thisFunction(**kwargs)
+            buildTimes.append(time.perf_counter() - startTime)
+            components.append(_import_cell(built._kdb_cell, name, prefix))
+        return components, buildTimes
+    processes = Settings.DEFAULT_THREADS if processes is None else processes
+    with tempfile.TemporaryDirectory() as tempDir:
+        paths = [os.path.join(tempDir, f"{idx}.oas") for idx in range(numBuilds)]
+        with concurrent.futures.ProcessPoolExecutor(max_workers = processes) as pool:
+            buildTimes = list(pool.map(_build_to_file, buildFunctions, kwargsList, paths))
+        for path, name, prefix in zip(paths, names, prefixes):
+            source = gf.kdb.Layout()
+            source.read(path)
+            components.append(_import_cell(source.top_cell(), name, prefix))
+    return components, buildTimes
+
+def grid_sites(columns, rows, pitch):
+    # (x, y) of every site of a columns x rows grid, centered on the origin, row by row
+    xs = pitch[0]*(np.arange(columns) - (columns - 1)/2)
+    ys = pitch[1]*(np.arange(rows) - (rows - 1)/2)
+    return [(float(x), float(y)) for y in ys for x in xs]
+
+def step_die(dieBody, # shared die content, e.g. die_and_floorplan + devices
+             columns = 1,
+             rows = 1,
+             pitch = (10000e0, 10000e0), # um
+             overlay = None, # module-level function returning the per-site overlay cell
+             overlayArgs = None, # list of kwargs dicts for overlay, one per site (row by row)
+             processes = None): # worker processes for overlays, 1 builds them in this process
+    # step dieBody over a columns x rows grid as one array reference, and place a
+    # per-site overlay (labels, dose-test structures...) on each site. overlays are built
+    # in parallel, so N sites cost one die body plus N small overlays. e.g.
+    # step_die(body, 10, 10, overlay = uno_wg.timestamp,
+    #          overlayArgs = [dict(quadrantLabel = f"D{i}") for i in range(100)])
+    # a plain function rather than a gf.cell, since the kwargs dicts aren't hashable
+    c = gf.Component()
+    c.name = _unique_name(c.kcl.layout, f"{dieBody.name}_step{columns}x{rows}")
+    body = c.add_ref(dieBody, columns = columns, rows = rows, spacing = pitch)
+    body.dmove((-pitch[0]*(columns - 1)/2, -pitch[1]*(rows - 1)/2))
+    sites = grid_sites(columns, rows, pitch)
+    if overlay is not None:
+        if overlayArgs is None or len(overlayArgs) != len(sites):
+            raise Exception(f"overlayArgs must have one entry per site ({len(sites)})!")
+        overlays, _ = build_parallel(overlay, overlayArgs,
+                                  [f"{overlay.__name__}_site{idx}" for idx in range(len(sites))], 
+                                  processes)
+        for site, thisOverlay in zip(sites, overlays):
+            (c << thisOverlay).dmove(site)
+    c.info["sites"] = sites
+    return c
+
+# layers that never count as quadrant content in mpw_assembly checks
+_NON_DESIGN_LAYERS = (LAYERS.FLOORPLAN, LAYERS.DIE, LAYERS.ANNOTATION)
+
+def _flat_layers_region(componentIn, layers = None, exclude = ()):
+    # flattened region of the given layers (all layers if None) of componentIn
+    if layers is None:
+        excluded = [layer_index(l, componentIn) for l in exclude]
+        layerIdx = [li for li in componentIn.kcl.layout.layer_indexes() if li not in excluded]
+    else:
+        layerIdx = [layer_index(l, componentIn) for l in layers]
+    region = gf.kdb.Region()
+    for li in layerIdx:
+        region.insert(componentIn.begin_shapes_rec(li))
+    return region
+
+def _polygon_counts(componentIn):
+    # (shapes stored in unique cells, shapes after flattening) of componentIn
+    layout = componentIn.kcl.layout
+    cells = [componentIn.cell_index()] + list(componentIn.called_cells())
+    stored = sum(layout.cell(ci).shapes(li).size() for ci in cells for li in layout.layer_indexes())
+    flat = _flat_layers_region(componentIn).count()
+    return stored, flat
+
+def mpw_assembly(quadrantBuilders, # four module-level functions, each returning one quadrant centered on the origin
+                 quadrantArgs = None, # four kwargs dicts for the builders
+                 quadrantNames = ("Q1", "Q2", "Q3", "Q4"), # also used as cell name prefixes
+                 desWidth = 8780e0, # matches ant_4x4_template
+                 trenchWidth = 260e0,
+                 keepOut = 0e0, # extra clearance (um) from the trench layers
+                 trenchLayers = (LAYERS.ANT_EDGE_TRENCH, LAYERS.BOSCH),
+                 processes = None): # worker processes, 1 builds in this process
+    # four independently designed quadrants in the ANT 4x4 template. quadrants are built
+    # concurrently in worker processes, checked against their quadrant box and the
+    # (sized) trench keep-outs of the template, and merged with their cell names prefixed
+    # by the quadrant name. quadrants go counterclockwise from top right (Q1).
+    # per-quadrant build time and polygon counts are printed and stored in info["quadrants"].
+    # like step_die a plain function, since the kwargs dicts aren't hashable
+    if len(quadrantBuilders) != 4:
+        raise Exception("mpw_assembly needs exactly four quadrant builders!")
+    quadrantArgs = [{}]*4 if quadrantArgs is None else quadrantArgs
+    c = gf.Component()
+    c.name = _unique_name(c.kcl.layout, "mpw_assembly")
+    c << uno_wg.ant_4x4_template()
+    c << uno_wg.ant_trench_perimeter()
+    dbu = c.kcl.layout.dbu
+    keepOutRegion = _flat_layers_region(c, trenchLayers).sized(round(keepOut/dbu))
+    
+    quadWidth = (desWidth - trenchWidth)/2
+    quadOffset = (desWidth + trenchWidth)/4
+    centers = [(quadOffset, quadOffset), (-quadOffset, quadOffset),
+               (-quadOffset, -quadOffset), (quadOffset, -quadOffset)]
+    quadrants, buildTimes = build_parallel(list(quadrantBuilders), quadrantArgs, quadrantNames, 
+                                           processes, [f"{name}_" for name in quadrantNames])
+    report = []
+    problems = []
+    for name, thisQuadrant, center, buildTime in zip(quadrantNames, quadrants, centers, buildTimes):
+        ref = c << thisQuadrant
+        ref.dmove(center)
+        content = _flat_layers_region(thisQuadrant, exclude = _NON_DESIGN_LAYERS)
+        content.transform(gf.kdb.Trans(round(center[0]/dbu), round(center[1]/dbu)))
+        quadBox = gf.kdb.DBox(center[0] - quadWidth/2, center[1] - quadWidth/2,
+                              center[0] + quadWidth/2, center[1] + quadWidth/2).to_itype(dbu)
+        if not content.is_empty() and not content.bbox().inside(quadBox):
+            problems.append(f"{name} extends outside its {quadWidth:.0f} um quadrant")
+        if not (content & keepOutRegion).is_empty():
+            problems.append(f"{name} overlaps the trench keep-out")
+        stored, flat = _polygon_counts(thisQuadrant)
+        report.append({"name": name, "build_time": buildTime, 
+                       "polygons": stored, "polygons_flat": flat})
+        print(f"{name}: built in {buildTime:.1f} s, {stored} polygons ({flat} flattened)")
+    if len(problems) > 0:
+        raise Exception("MPW quadrant check failed: " + "; ".join(problems))
+    c.info["quadrants"] = report
+    return c
@@ -0,0 +1,231 @@
+# local, vectorized helpers for turning layouts + the layer stack into simulation inputs
+# (e.g. permittivity cross sections for mode solvers)
+
+
+import gdsfactory as gf
+import numpy as np
+import scipy.ndimage
+from gdsfactory.technology import LogicalLayer
+from gdsfactory.technology.processes import Etch, Grow, Planarize
+from uno_layout import LayerMapUNO, layer_index
+from uno_layout.layer_stack import LAYER_STACK, WAFER_STACK, get_process
+LAYERS = LayerMapUNO
+
+# relative permittivity of the stack materials near 1550 nm
+MATERIAL_PERMITTIVITY = {
+    "si": 3.476**2,
+    "sio2": 1.444**2,
+    "si3n4": 1.996**2,
+    "air": 1e0,
+}
+
+# process descriptions use looser material names than the layer stack
+MATERIAL_ALIASES = {
+    "silicon": "si",
+    "oxide": "sio2",
+    "nitride": "si3n4",
+}
+
+
+def _is_wafer_level(level):
+    # levels drawn on WAFER cover every cut completely
+    return (isinstance(level.layer, LogicalLayer)
+            and gf.get_layer(level.layer.layer) == gf.get_layer(LAYERS.WAFER))
+
+def _cut_intervals(region, cuts, dbu):
+    # every interval of every cut inside region, as (cutIdx, s0, s1) arrays with s in um
+    # measured from the start of the cut. all cuts go through one Edges & Region call,
+    # then pieces are matched back to their cut by projection
+    edges = gf.kdb.Edges()
+    edges.merged_semantics = False
+    for (x0, y0), (x1, y1) in cuts:
+        edges.insert(gf.kdb.Edge(gf.kdb.Point(int(round(x0/dbu)), int(round(y0/dbu))),
+                                 gf.kdb.Point(int(round(x1/dbu)), int(round(y1/dbu)))))
+    pieces = np.array([(e.p1.x, e.p1.y, e.p2.x, e.p2.y) for e in (edges & region).each()],
+                      dtype = float).reshape(-1, 4)*dbu
+    if len(pieces) == 0:
+        return np.zeros(0, dtype = int), np.zeros(0), np.zeros(0)
+    starts = cuts[:, 0, :]
+    directions = cuts[:, 1, :] - cuts[:, 0, :]
+    lengths = np.linalg.norm(directions, axis = -1)
+    directions = directions/lengths[:, None]
+    # distance of each piece's midpoint from each cut line, and its position along it
+    mids = (pieces[:, :2] + pieces[:, 2:])/2
+    rel = mids[:, None, :] - starts[None, :, :]
+    along = np.einsum('pcd,cd->pc', rel, directions)
+    across = np.abs(rel[..., 0]*directions[None, :, 1] - rel[..., 1]*directions[None, :, 0])
+    across[(along < 0) | (along > lengths[None, :])] = np.inf
+    cutIdx = np.argmin(across, axis = 1)
+    ends = np.stack([np.einsum('pd,pd->p', pieces[:, 2*k:2*k + 2] - starts[cutIdx], directions[cutIdx])
+                     for k in range(2)], axis = -1)
+    return cutIdx, ends.min(axis = -1), ends.max(axis = -1)
+
+def cross_section_permittivity(componentIn,
+                               cuts, # ((x0, y0), (x1, y1)) or an array of them, um
+                               layerStack = LAYER_STACK,
+                               s = None, # grid along the cuts (um from cut start), uniform or graded
+                               z = None, # vertical grid (um), uniform or graded
+                               ds = 0.02, # default grid steps
+                               dz = 0.02,
+                               zPad = 1e0, # default z grid extends this far past the patterned levels
+                               materials = MATERIAL_PERMITTIVITY,
+                               background = "air",
+                               batchSize = 256): # intervals painted at once, bounds memory
+    # permittivity of componentIn on vertical cross sections along the given cut lines,
+    # for local mode solvers. returns (s, z, eps) with eps of shape (numCuts, len(s), len(z)),
+    # or (len(s), len(z)) for a single cut.
+    # each level is painted between zmin and zmin + thickness, with its sidewall_angle
+    # applied around width_to_z (assuming cuts cross the sidewalls at normal incidence);
+    # where levels overlap the lowest mesh_order wins. WAFER levels fill the whole cut
+    dbu = componentIn.kcl.layout.dbu
+    cuts = np.asarray(cuts, dtype = float)
+    singleCut = cuts.ndim == 2
+    cuts = cuts.reshape(-1, 2, 2)
+    numCuts = len(cuts)
+    lengths = np.linalg.norm(cuts[:, 1] - cuts[:, 0], axis = -1)
+    levels = sorted(layerStack.layers.values(), key = lambda l: -l.mesh_order)
+    if s is None:
+        s = np.arange(0e0, lengths.max() + ds/2, ds)
+    if z is None:
+        patterned = [l for l in levels if not _is_wafer_level(l)]
+        patterned = levels if len(patterned) == 0 else patterned
+        z = np.arange(min(l.zmin for l in patterned) - zPad,
+                      max(l.zmin + l.thickness for l in patterned) + zPad + dz/2, dz)
+    s = np.asarray(s, dtype = float)
+    z = np.asarray(z, dtype = float)
+
+    for thisLevel in levels:
+        if thisLevel.material not in materials:
+            raise Exception(f"No permittivity for material {thisLevel.material}, add it to materials!")
+    eps = np.full((numCuts, len(s), len(z)), materials[background], dtype = float)
+    regions = {}
+    for thisLevel in levels:
+        zIn = (z >= thisLevel.zmin) & (z < thisLevel.zmin + thisLevel.thickness)
+        if not zIn.any():
+            continue
+        if _is_wafer_level(thisLevel):
+            cutIdx, s0, s1 = np.arange(numCuts), np.zeros(numCuts), lengths
+        else:
+            if thisLevel.layer not in regions:
+                regions[thisLevel.layer] = thisLevel.layer.get_shapes(componentIn)
+            cutIdx, s0, s1 = _cut_intervals(regions[thisLevel.layer], cuts, dbu)
+        if len(cutIdx) == 0:
+            continue
+        # sidewalls move interval ends that are real polygon edges, not the ends of the cut
+        zRef = thisLevel.zmin + thisLevel.width_to_z*thisLevel.thickness
+        shift = (z - zRef)*np.tan(np.radians(thisLevel.sidewall_angle))
+        tol = 1e0*dbu
+        lo = s0[:, None] + np.where(s0 > tol, 1e0, 0e0)[:, None]*shift[None, :]
+        hi = s1[:, None] - np.where(s1 < lengths[cutIdx] - tol, 1e0, 0e0)[:, None]*shift[None, :]
+        mask = np.zeros(eps.shape, dtype = bool)
+        for start in range(0, len(cutIdx), batchSize):
+            batch = slice(start, start + batchSize)
+            inside = ((s[None, :, None] >= lo[batch, None, :]) & (s[None, :, None] <= hi[batch, None, :])
+                      & zIn[None, None, :])
+            np.logical_or.at(mask, cutIdx[batch], inside)
+        eps[mask] = materials[thisLevel.material]
+
+    if singleCut:
+        eps = eps[0]
+    return s, z, eps
+
+def _material_name(material):
+    return MATERIAL_ALIASES.get(material.lower(), material.lower())
+
+def _step_mask(componentIn, step, cuts, s, lengths, dbu):
+    # (numCuts, len(s)) mask of where a lithography step opens the wafer
+    def drawn(layer):
+        region = gf.kdb.Region(componentIn.begin_shapes_rec(layer_index(layer, componentIn)))
+        cutIdx, s0, s1 = _cut_intervals(region, cuts, dbu)
+        mask = np.zeros((len(cuts), len(s)), dtype = bool)
+        np.logical_or.at(mask, cutIdx, (s[None, :] >= s0[:, None]) & (s[None, :] <= s1[:, None]))
+        return mask
+    if step.layer is None:
+        return s[None, :] <= lengths[:, None]
+    mask = drawn(step.layer)
+    for layer in step.layers_or or []:
+        mask |= drawn(layer)
+    for layer in step.layers_and or []:
+        mask &= drawn(layer)
+    for layer in step.layers_diff or []:
+        mask &= ~drawn(layer)
+    for layer in step.layers_xor or []:
+        mask ^= drawn(layer)
+    return mask if step.positive_tone else ~mask
+
+def _surface(labels, z):
+    # height of the topmost solid cell of every column, -inf for empty columns
+    solid = labels != 0
+    topIdx = labels.shape[-1] - 1 - np.argmax(solid[..., ::-1], axis = -1)
+    return np.where(solid.any(axis = -1), z[topIdx], -np.inf)
+
+def emulate_process(componentIn,
+                    cuts, # ((x0, y0), (x1, y1)) or an array of them, um
+                    process = None, # sequence of process steps, defaults to get_process()
+                    waferStack = WAFER_STACK, # blanket films before processing
+                    s = None, # grid along the cuts (um from cut start)
+                    z = None, # vertical grid (um)
+                    ds = 0.02,
+                    dz = 0.02,
+                    zRange = (-1e0, 4e0)): # default z grid
+    # 2D process emulation on cross sections of componentIn: the wafer starts as blanket
+    # films of waferStack, then Etch/Grow/Planarize steps are applied to every cut at once.
+    # etches are anisotropic and selective to their material; grows are "anisotropic"
+    # (vertical, follows topography column by column) or "isotropic" (conformal, by
+    # distance transform, needs a uniform grid).
+    # returns (s, z, labels, names): labels[cut, s, z] indexes names, with 0 being air
+    dbu = componentIn.kcl.layout.dbu
+    process = get_process() if process is None else process
+    cuts = np.asarray(cuts, dtype = float)
+    singleCut = cuts.ndim == 2
+    cuts = cuts.reshape(-1, 2, 2)
+    lengths = np.linalg.norm(cuts[:, 1] - cuts[:, 0], axis = -1)
+    s = np.arange(0e0, lengths.max() + ds/2, ds) if s is None else np.asarray(s, dtype = float)
+    z = np.arange(zRange[0], zRange[1] + dz/2, dz) if z is None else np.asarray(z, dtype = float)
+    names = ["air"]
+    def label(material):
+        name = _material_name(material)
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+    onCut = (s[None, :] <= lengths[:, None])[..., None]
+
+    labels = np.zeros((len(cuts), len(s), len(z)), dtype = np.int8)
+    for thisLevel in sorted(waferStack.layers.values(), key = lambda l: -l.mesh_order):
+        zIn = (z >= thisLevel.zmin) & (z < thisLevel.zmin + thisLevel.thickness)
+        labels[onCut & zIn[None, None, :]] = label(thisLevel.material)
+
+    for step in process:
+        if isinstance(step, Planarize):
+            labels[..., z > step.height] = 0
+            continue
+        if not isinstance(step, (Etch, Grow)):
+            print(f"Warning: skipping unsupported process step {step.name}")
+            continue
+        opened = _step_mask(componentIn, step, cuts, s, lengths, dbu)[..., None] & onCut
+        surface = _surface(labels, z)[..., None]
+        if isinstance(step, Etch):
+            if step.type != "anisotropic":
+                raise Exception(f"Etch type {step.type} not supported, only anisotropic!")
+            labels[opened & (z > surface - step.depth) & (labels == label(step.material))] = 0
+        elif step.type == "anisotropic":
+            labels[opened & (labels == 0) & (z > surface) & (z <= surface + step.thickness)] = label(step.material)
+        elif step.type == "isotropic":
+            if len(s) < 2 or not (np.allclose(np.diff(s), s[1] - s[0]) and np.allclose(np.diff(z), z[1] - z[0])):
+                raise Exception("isotropic Grow needs uniform s and z grids!")
+            distance = np.stack([scipy.ndimage.distance_transform_edt(cutLabels == 0, sampling = (s[1] - s[0], z[1] - z[0]))
+                                 for cutLabels in labels])
+            labels[opened & (labels == 0) & (distance <= step.thickness)] = label(step.material)
+        else:
+            raise Exception(f"Grow type {step.type} not supported, use anisotropic or isotropic!")
+
+    if singleCut:
+        labels = labels[0]
+    return s, z, labels, names
+
+def labels_to_permittivity(labels, names, materials = MATERIAL_PERMITTIVITY):
+    # permittivity array from emulate_process output
+    for name in names:
+        if name not in materials:
+            raise Exception(f"No permittivity for material {name}, add it to materials!")
+    return np.array([materials[name] for name in names])[labels]
@@ -1,3 +1,4 @@
+import numpy as np
 import gdsfactory as gf
 #from uno_layout import LAYERS, DEFAULT_WG_WIDTH, DEFAULT_EDGE_SEP, DEFAULT_ROUTE_WIDTH
 import uno_layout.components_wg as uno_wg
@@ -9,6 +10,7 @@ DEFAULT_RADIUS = Settings.DEFAULT_RADIUS
 DEFAULT_EDGE_SEP = Settings.DEFAULT_EDGE_SEP
 DEFAULT_TEXT_SIZE = Settings.DEFAULT_TEXT_SIZE
 DEFAULT_DXDY = Settings.DEFAULT_DXDY
+DEFAULT_ROUTE_WIDTH = Settings.DEFAULT_ROUTE_WIDTH
 
 @gf.cell
 def boschGapTest(tWidthList, 
@@ -16,16 +18,17 @@ def boschGapTest(tWidthList,
                  dy = 1000, 
                  tLength = 500, 
                  bridge = 50):
+    # row of trenches of increasing width, bridge apart
+    # one rectangle cell per unique width, positions from a cumulative sum
     c = gf.Component()
-    thisDx = dx
-    thisDy = dy
-    for tWidth in tWidthList:
-        thisDx += tWidth/2
-        thisRect = c << gf.components.rectangle(size = (tWidth, tLength), 
-                                                layer = LAYERS.BOSCH, 
-                                                centered = True)
-        thisRect.move((thisDx, thisDy))
-        thisDx += tWidth/2 + bridge
+    tWidths = np.asarray(tWidthList, dtype = float)
+    centers = dx + np.cumsum(tWidths) - tWidths/2 + bridge*np.arange(len(tWidths))
+    for tWidth in np.unique(tWidths):
+        thisRectCell = gf.components.rectangle(size = (tWidth, tLength), 
+                                               layer = LAYERS.BOSCH, 
+                                               centered = True)
+        for thisDx in centers[tWidths == tWidth]:
+            (c << thisRectCell).dmove((thisDx, dy))
     return c
 
 @gf.cell
@@ -36,37 +39,43 @@ def boschBridgeTest(tBridgeList,
                     wdy = 3100,
                     rdy = 500,
                     wgWidth = DEFAULT_WG_WIDTH,
-                    edgeSep = DEFAULT_EDGE_SEP):
+                    edgeSep = DEFAULT_EDGE_SEP,
+                    boschWidth = uno_wg.DEFAULT_BOSCH_WIDTH):
     # run waveguides through bosch "bridges" to see what's safe
     # dx and wdy refer to dx and dy of first waveguide - first Bosch will be closer in    
+    # trenches share one rectangle cell and waveguides share one edge coupler cell,
+    # placed directly here (same geometry as straight_waveguide) at cumulative-sum positions
     c = gf.Component()
+    tBridges = np.asarray(tBridgeList, dtype = float)
+    numBridges = len(tBridges)
+    # trench i+1 sits tWidth + tBridges[i] after trench i, each waveguide mid-bridge
+    rectCenters = dx + tWidth*np.arange(numBridges + 1) + np.concatenate(([0e0], np.cumsum(tBridges)))
+    wgDxs = rectCenters[:-1] + tWidth/2 + tBridges/2
+    wgDys = wdy + edgeSep*np.arange(numBridges)
     
-    rectDx = dx
-    rectDy = rdy
+    thisRectCell = gf.components.rectangle(size = (tWidth, tLength), 
+                                           layer = LAYERS.BOSCH, 
+                                           centered = True)
+    for rectDx in rectCenters:
+        (c << thisRectCell).dmove((rectDx, rdy))
     
-    wgDx = dx
-    wgDy = wdy
-    thisRect = c << gf.components.rectangle(size = (tWidth, tLength), 
-                                            layer = LAYERS.BOSCH, 
-                                            centered = True)
-    thisRect.move((rectDx, rectDy))
-    rectDx += tWidth
-    wgDx += tWidth/2
-    
-    for tBridgeIdx in enumerate(tBridgeList):
-        tBridge = tBridgeIdx[1]
-        rectDx += tBridge
-        thisRect = c << gf.components.rectangle(size = (tWidth, tLength), 
-                                                layer = LAYERS.BOSCH, 
-                                                centered = True)
-        thisRect.move((rectDx, rectDy))
-        rectDx += tWidth
-        wgDx += tBridge/2
-        c << uno_wg.straight_waveguide(wgDx, wgDy, wgWidth,
-                                labelIn = f"B{tBridgeIdx[0]}", 
-                                labelOut = f"B{tBridgeIdx[0]}")
-        wgDx += tBridge/2 + tWidth
-        wgDy += edgeSep
+    crossSection = waveguide_xs(wgWidth)
+    thisEdgeCoupler = uno_wg.edge_coupler(wgWidth = wgWidth, straightLength = boschWidth/2)
+    for bridgeIdx, (wgDx, wgDy) in enumerate(zip(wgDxs, wgDys)):
+        e1 = c << thisEdgeCoupler
+        e1.dmove(e1.ports["o1"].dcenter, (0, wgDy))
+        e2 = c << thisEdgeCoupler
+        e2.drotate(90)
+        e2.dmove(e2.ports["o1"].dcenter, (wgDx, 0))
+        gf.routing.route_single(c, e1.ports["o2"], e2.ports["o2"], cross_section = crossSection)
+        uno_wg.add_label(c, f"B{bridgeIdx}", size = DEFAULT_TEXT_SIZE, 
+                         position = (boschWidth, wgDy + 15e0),
+                         layer = LAYERS.LABEL)
+        uno_wg.add_label(c, f"B{bridgeIdx}", size = DEFAULT_TEXT_SIZE,
+                         layer = LAYERS.LABEL,
+                         position = (wgDx + 15e0, boschWidth),
+                         justify = "right",
+                         rotation = -90)
     return c
 
 @gf.cell
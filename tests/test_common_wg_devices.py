@@ -0,0 +1,24 @@
+import gdsfactory as gf
+import uno_layout.components_wg as uno_wg
+import uno_layout.common_wg_devices as uno_devices
+from uno_layout import LayerMapUNO, layer_index
+LAYERS = LayerMapUNO
+
+
+def test_grating_array_test_bundles_without_overlaps():
+    rings = tuple(uno_devices.gen_racetrack(numCouplers = 2, ringLength = 500e0 + 20e0*i, 
+                                            couplingLength = 10e0, couplerDx = 30, couplerDy = 10,
+                                            includeHeater = False) for i in range(7))
+    c = uno_devices.grating_array_test(uno_wg.apodized_grating_coupler_rectangular(), rings,
+                                       numGratings = 32,
+                                       dutPortOrders = (("o2", "o4", "o3", "o1"),)*len(rings))
+    wgIdx = layer_index(LAYERS.WG, c)
+    # gratings, rings and bundles only ever touch: their WG areas add up to the merged area
+    partsArea = 0
+    for inst in c.insts:
+        thisRegion = gf.kdb.Region(inst.cell.begin_shapes_rec(wgIdx))
+        thisRegion.merge()
+        partsArea += thisRegion.area()*max(inst.na, 1)*max(inst.nb, 1)
+    allWg = gf.kdb.Region(c.begin_shapes_rec(wgIdx))
+    assert abs(partsArea - allWg.merged().area()) < 1e-6*partsArea
+    assert sum(inst.cell.name.startswith("gen_racetrack") for inst in c.insts) == len(rings)
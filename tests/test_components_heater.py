@@ -0,0 +1,17 @@
+import gdsfactory as gf
+import pytest
+import uno_layout.common_wg_devices as uno_devices
+import uno_layout.components_heater as uno_heater
+from uno_layout import LayerMapUNO, layer_index
+LAYERS = LayerMapUNO
+
+
+@pytest.mark.parametrize("assignment", ["crossing", "length"])
+@pytest.mark.parametrize("numDevices", [1, 4])
+def test_heater_fanout_one_polygon_per_net(assignment, numDevices):
+    # up- and down-facing heater ports share an x, so the escape jogs decide the levels
+    device = uno_devices.gen_racetrack(numCouplers = 2, includeHeater = True, ringLength = 600)
+    c = uno_heater.heater_fanout(tuple([device]*numDevices), assignment = assignment)
+    routing = gf.kdb.Region(c.begin_shapes_rec(layer_index(LAYERS.ROUTING, c)))
+    routing.merge()
+    assert routing.count() == 2*numDevices
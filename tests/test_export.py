@@ -0,0 +1,57 @@
+import json
+import os
+import gdsfactory as gf
+import numpy as np
+import uno_layout.components_wg as uno_wg
+from uno_layout.export import export_gltf, write_blocks
+
+
+def test_export_gltf(tmp_path):
+    c = gf.Component()
+    c.add_ref(gf.components.straight(), columns = 3, rows = 2, spacing = (20e0, 5e0))
+    coupler = c << uno_wg.coupler_asymmetric()
+    coupler.dmirror_x()
+    gltfPath = export_gltf(c, os.path.join(tmp_path, "test"))
+    with open(gltfPath) as f:
+        gltf = json.load(f)
+    buffer = np.fromfile(os.path.join(tmp_path, "test.bin"), dtype = np.uint8)
+    assert gltf["buffers"][0]["byteLength"] == len(buffer)
+    for mesh in gltf["meshes"]:
+        for primitive in mesh["primitives"]:
+            positions = gltf["accessors"][primitive["attributes"]["POSITION"]]
+            indices = gltf["accessors"][primitive["indices"]]
+            view = gltf["bufferViews"][indices["bufferView"]]
+            values = np.frombuffer(buffer[view["byteOffset"]:view["byteOffset"] + view["byteLength"]].tobytes(),
+                                   dtype = np.uint32)
+            assert len(values) == indices["count"] and len(values) % 3 == 0
+            assert values.max() < positions["count"]
+    # the straight is one mesh, placed once per array element
+    straightMeshes = [idx for idx, m in enumerate(gltf["meshes"]) if m["name"].startswith("straight")]
+    assert len(straightMeshes) == 1
+    assert sum(n.get("mesh") == straightMeshes[0] for n in gltf["nodes"]) == 6
+
+def test_write_blocks_roundtrip(tmp_path):
+    c = gf.Component()
+    c.add_polygon([(0, 0), (50, 0), (50, 50)], layer = (1, 0))
+    c.add_ref(gf.components.straight(), columns = 3, rows = 2, spacing = (20e0, 5e0))
+    (c << uno_wg.coupler_asymmetric()).dmove((0, 100e0))
+    (c << uno_wg.coupler_asymmetric()).dmove((0, 200e0))
+    paths = write_blocks(c, os.path.join(tmp_path, "blocks"), processes = 2)
+    assert len(paths) == 3
+    # the top file alone keeps its instances, pointing at (empty) block cells
+    topOnly = gf.kdb.Layout()
+    topOnly.read(paths[0])
+    assert topOnly.top_cell().name == c.name and topOnly.top_cell().child_instances() == 3
+    # all files together give back the full design
+    layout = gf.kdb.Layout()
+    for path in paths:
+        layout.read(path)
+    readBack = layout.cell(c.name)
+    for layerIdx in c.kcl.layout.layer_indexes():
+        info = c.kcl.layout.get_info(layerIdx)
+        original = gf.kdb.Region(c.begin_shapes_rec(layerIdx))
+        readIdx = layout.find_layer(info)
+        if readIdx is None:
+            assert original.is_empty()
+            continue
+        assert (gf.kdb.Region(readBack.begin_shapes_rec(readIdx)) ^ original).is_empty()
@@ -0,0 +1,32 @@
+import json
+import os
+import klayout.rdb
+import uno_layout.regression as uno_regression
+
+
+def test_regression_roundtrip(tmp_path):
+    directory = str(tmp_path)
+    uno_regression.write_golden(directory)
+    results = uno_regression.check_regression(directory)
+    assert all(r["status"] == "unchanged" for r in results.values())
+
+    # a stale hash forces the XOR, which must find no difference
+    hashFile = os.path.join(directory, uno_regression.HASH_FILE)
+    with open(hashFile) as f:
+        hashes = json.load(f)
+    for key in hashes["mode_filter_0"]:
+        hashes["mode_filter_0"][key] = "stale"
+    with open(hashFile, "w") as f:
+        json.dump(hashes, f)
+    results = uno_regression.check_regression(directory)
+    assert results["mode_filter_0"]["status"] == "equivalent"
+
+    # changed geometry under a stored case id is reported with markers, on one tile and on several
+    changed = {"coupler_asymmetric": (uno_regression.REGRESSION_CASES["coupler_asymmetric"][0], [{"gap": 0.25}])}
+    for tileSize in (None, 2e0):
+        markerFile = os.path.join(directory, f"changed{tileSize}.lyrdb")
+        results = uno_regression.check_regression(directory, changed, markerFile, tileSize = tileSize)
+        assert results["coupler_asymmetric_0"]["status"] == "changed"
+        rdb = klayout.rdb.ReportDatabase("")
+        rdb.load(markerFile)
+        assert rdb.num_items() > 0
@@ -0,0 +1,55 @@
+import gdsfactory as gf
+import pytest
+import uno_layout.components_wg as uno_wg
+import uno_layout.reticle as uno_reticle
+from uno_layout import LayerMapUNO, layer_index
+LAYERS = LayerMapUNO
+
+
+@pytest.mark.parametrize("processes", [1, 2]) # in this process, in worker processes
+def test_step_die_overlays(processes):
+    body = uno_wg.coupler_asymmetric()
+    c = uno_reticle.step_die(body, 3, 2, pitch = (1000e0, 800e0), overlay = uno_wg.timestamp,
+                             overlayArgs = [dict(quadrantLabel = f"D{i}") for i in range(6)],
+                             processes = processes)
+    bodies = [inst for inst in c.insts if inst.cell.name == body.name]
+    assert len(bodies) == 1 and bodies[0].na*bodies[0].nb == 6
+    overlays = [inst for inst in c.insts if inst.cell.name != body.name]
+    assert len(overlays) == 6
+    # every site gets its own overlay, shifted onto the site
+    assert len(set(inst.cell.name for inst in overlays)) == 6
+    for inst, site in zip(overlays, c.info["sites"]):
+        assert inst.dcplx_trans.disp.x == pytest.approx(site[0])
+        assert inst.dcplx_trans.disp.y == pytest.approx(site[1])
+    # overlays come back from the workers with all their geometry
+    labels = gf.kdb.Region(c.begin_shapes_rec(layer_index(LAYERS.LABEL, c)))
+    expected = sum(gf.kdb.Region(uno_wg.timestamp(quadrantLabel = f"D{i}").begin_shapes_rec(
+                   layer_index(LAYERS.LABEL, c))).merged().area() for i in range(6))
+    assert labels.merged().area() == expected
+    with pytest.raises(Exception):
+        uno_reticle.step_die(body, 3, 2, overlay = uno_wg.timestamp, overlayArgs = [{}])
+
+def _square_quadrant(width = 100e0, layer = LAYERS.WG):
+    # module level so worker processes can unpickle it
+    return gf.components.rectangle(size = (width, width), layer = layer, centered = True)
+
+@pytest.mark.parametrize("processes", [1, 2]) # in this process, in worker processes
+def test_mpw_assembly(processes):
+    builders = (_square_quadrant, uno_wg.coupler_asymmetric, _square_quadrant, uno_wg.timestamp)
+    args = [{"width": 1000e0}, {}, {"width": 2000e0}, {"quadrantLabel": "Q4"}]
+    c = uno_reticle.mpw_assembly(builders, args, processes = processes)
+    report = c.info["quadrants"]
+    assert [q["name"] for q in report] == ["Q1", "Q2", "Q3", "Q4"]
+    assert all(q["polygons"] > 0 for q in report)
+    # quadrant content lands in its quadrant, with its cell names prefixed
+    wg = gf.kdb.Region(c.begin_shapes_rec(layer_index(LAYERS.WG, c)))
+    assert wg.merged().area()*c.kcl.layout.dbu**2 == pytest.approx(1000e0**2 + 2000e0**2, rel = 1e-3)
+    # (names get a $n suffix when an earlier build already used them)
+    assert set(inst.cell.name.split("$")[0] for inst in c.insts) >= {"Q1", "Q2", "Q3", "Q4"}
+    names = [c.kcl.layout.cell(idx).name for idx in c.called_cells()]
+    assert any(name.startswith("Q4_") for name in names)
+
+def test_mpw_assembly_checks_quadrant_box():
+    builders = (_square_quadrant,)*4
+    with pytest.raises(Exception, match = "outside"):
+        uno_reticle.mpw_assembly(builders, [{"width": 5000e0}] + [{}]*3, processes = 1)
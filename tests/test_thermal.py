@@ -0,0 +1,20 @@
+import numpy as np
+from uno_layout.thermal import _point_kernel, K_OXIDE
+from uno_layout.layer_stack import LayerStackParameters
+
+zHeater = LayerStackParameters.box_thickness + LayerStackParameters.thickness_clad
+zWg = LayerStackParameters.box_thickness + LayerStackParameters.thickness_wg/2
+rho = np.linspace(0e0, 10*zHeater, 2001)
+
+
+def test_point_kernel_converged():
+    kernel = _point_kernel(rho, zWg, zHeater, K_OXIDE, 200, 64)
+    finer = _point_kernel(rho, zWg, zHeater, K_OXIDE, 800, 256)
+    np.testing.assert_allclose(kernel, finer, rtol = 1e-5, atol = 1e-9*kernel.max())
+
+def test_point_kernel_positive_decaying():
+    kernel = _point_kernel(rho, zWg, zHeater, K_OXIDE, 200, 64)
+    assert np.all(kernel >= 0)
+    assert np.all(np.diff(kernel) <= 0)
+    # far field decays as exp(-pi*rho/(2*zHeater))
+    assert kernel[-1] < 1e-5*kernel[0]
@@ -0,0 +1,79 @@
+import gdsfactory as gf
+import pytest
+import uno_layout.components_wg as uno_wg
+import uno_layout.tools as uno_tools
+from uno_layout import LayerMapUNO, layer_index
+LAYERS = LayerMapUNO
+
+
+def _flat(componentIn, layer):
+    return gf.kdb.Region(componentIn.begin_shapes_rec(layer_index(layer, componentIn)))
+
+def test_offset_waveguide_single_tile():
+    # smaller than one tile: the tiling processor runs without a _tile
+    source = uno_wg.coupler_asymmetric()
+    offset = uno_tools.offset_waveguide(source, 0.1)
+    expected = _flat(source, LAYERS.WG).sized(round(0.05/source.kcl.layout.dbu))
+    assert (_flat(offset, LAYERS.WG) ^ expected).is_empty()
+
+def test_bias_layers_multi_tile():
+    source = uno_wg.coupler_asymmetric()
+    biased = uno_tools.bias_layers(source, {LAYERS.WG: 0.1}, tileSize = 5e0)
+    expected = _flat(source, LAYERS.WG).sized(round(0.05/source.kcl.layout.dbu))
+    # only slivers along tile seams may differ
+    assert (_flat(biased, LAYERS.WG) ^ expected).area() < 1e-3*expected.area()
+
+@pytest.mark.parametrize("size", [80e0, 300e0]) # one tile, several tiles
+def test_density_fill(size):
+    c = gf.Component()
+    c.add_polygon([(0, 0), (size, 0), (size, size), (0, size)], layer = LAYERS.FLOORPLAN)
+    c.add_polygon([(10, 10), (20, 10), (20, size - 10), (10, size - 10)], layer = LAYERS.WG)
+    filled = uno_tools.density_fill(c, targetDensity = 0.3, minSpacing = 1e0, tileSize = 100e0)
+    dbu = c.kcl.layout.dbu
+    original = _flat(c, LAYERS.WG)
+    allWg = _flat(filled, LAYERS.WG)
+    allWg.merge()
+    assert abs(dbu**2*allWg.area()/size**2 - 0.3) < 0.05
+    posts = allWg - original
+    assert not posts.is_empty()
+    # posts keep out of the waveguide
+    assert (posts & original.sized(round(2.9/dbu))).is_empty()
+
+def test_bias_layers_flattens_only_biased_layers():
+    source = gf.Component()
+    for dy in [0e0, 20e0]:
+        source.add_ref(uno_wg.coupler_asymmetric()).dmovey(dy)
+    biased = uno_tools.bias_layers(source, {LAYERS.WG: 0.1})
+    wgIdx = layer_index(LAYERS.WG, biased)
+    # the biased layer sits flat on the top cell, nothing left in the children
+    assert biased.shapes(wgIdx).size() > 0
+    layout = biased.kcl.layout
+    assert all(layout.cell(idx).shapes(wgIdx).is_empty() for idx in biased.called_cells())
+    # the instance tree itself is kept
+    assert len(list(biased.called_cells())) == len(list(source.called_cells())) > 0
+    expected = _flat(source, LAYERS.WG).sized(round(0.05/layout.dbu))
+    assert (_flat(biased, LAYERS.WG) ^ expected).is_empty()
+
+def test_generic_2port_batch_no_overlaps():
+    duts = (uno_wg.spiral_delay_line(length = 5000e0), 
+            uno_wg.spiral_delay_line(length = 20000e0),
+            uno_wg.spiral_delay_line(length = 3000e0, footprint = (300e0, 300e0)))
+    batch = uno_tools.generic_2port_batch(duts, dxdy = (2000e0, 1000e0))
+    dutBoxes = [inst.dbbox() for inst in batch.insts if inst.cell.name.startswith("double_spiral")]
+    assert len(dutBoxes) == len(duts)
+    for idx, box in enumerate(dutBoxes):
+        # right of the input couplers, clear of each other
+        assert box.left >= 500e0
+        assert all(not box.overlaps(other) for other in dutBoxes[idx + 1:])
+    # DUTs, couplers and routes only ever touch: their WG areas add up to the merged area
+    wgIdx = layer_index(LAYERS.WG, batch)
+    partsArea = 0
+    for inst in batch.insts:
+        thisRegion = gf.kdb.Region(inst.cell.begin_shapes_rec(wgIdx))
+        thisRegion.merge()
+        partsArea += thisRegion.area()*max(inst.na, 1)*max(inst.nb, 1)
+    assert partsArea == pytest.approx(_flat(batch, LAYERS.WG).merged().area(), rel = 1e-6)
+    assert len(batch.info["lengths"]) == len(duts)
+    # the 20 mm spiral doesn't fit left of the default output couplers
+    with pytest.raises(Exception):
+        uno_tools.generic_2port_batch(duts)
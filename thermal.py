@@ -0,0 +1,133 @@
+# fast thermal crosstalk estimates for heater layouts, by superposition of
+# analytic point-source responses convolved with rasterized heaters
+
+
+import gdsfactory as gf
+import numpy as np
+import scipy.fft
+import scipy.special
+from uno_layout import LayerMapUNO, layer_index
+from uno_layout.layer_stack import LayerStackParameters
+LAYERS = LayerMapUNO
+
+K_OXIDE = 1.4 # W/(m*K), thermal conductivity of SiO2 cladding and box
+
+
+def _point_kernel(rho, zObs, zHeater, kThermal, numImages, numModes):
+    # temperature rise (K) per W at lateral distance rho (um) from a point source at
+    # height zHeater above an isothermal sink (the substrate) at z = 0, observed at zObs.
+    # the heater sits on the adiabatic top surface of the cladding, so images repeat
+    # with period 4*zHeater: +2 at (4n+1)*zHeater and -2 at (4n-1)*zHeater.
+    # the image sum only converges quickly close to the source, further out the slab's
+    # mode sum sin(k z)*sin(k zHeater)*K0(k rho), k = (m + 1/2)*pi/zHeater, decays
+    # exponentially and is used instead
+    rho = np.asarray(rho, dtype = float)
+    T = np.zeros_like(rho)
+    near = rho < zHeater/2
+    rhoNear = rho[near]
+    TNear = np.zeros_like(rhoNear)
+    # +n and -n together, so the truncated tail cancels to first order
+    for n in range(-numImages, numImages + 1):
+        TNear += 1/np.sqrt(rhoNear**2 + (zObs - (4*n + 1)*zHeater)**2)
+        TNear -= 1/np.sqrt(rhoNear**2 + (zObs - (4*n - 1)*zHeater)**2)
+    # 1/um -> 1/m
+    T[near] = 2e6*TNear/(4*np.pi*kThermal)
+    rhoFar = rho[~near]
+    TFar = np.zeros_like(rhoFar)
+    for m in range(numModes):
+        k = (m + 0.5)*np.pi/zHeater
+        TFar += np.sin(k*zObs)*np.sin(k*zHeater)*scipy.special.k0(k*rhoFar)
+    T[~near] = 1e6*TFar/(np.pi*kThermal*zHeater)
+    return T
+
+def _rasterize(region, origin, pixel, shape):
+    # fraction of each pixel covered by region, as a (ny, nx) array.
+    # only the region's bbox is rasterized, then pasted into the full grid
+    image = np.zeros(shape)
+    if region.is_empty():
+        return image
+    box = region.bbox()
+    ix0 = max(int((box.left - origin[0])//pixel), 0)
+    iy0 = max(int((box.bottom - origin[1])//pixel), 0)
+    ix1 = min(int(-((origin[0] - box.right)//pixel)), shape[1])
+    iy1 = min(int(-((origin[1] - box.top)//pixel)), shape[0])
+    areas = region.rasterize(gf.kdb.Point(origin[0] + ix0*pixel, origin[1] + iy0*pixel),
+                             gf.kdb.Vector(pixel, pixel), gf.kdb.Vector(pixel, pixel),
+                             ix1 - ix0, iy1 - iy0)
+    image[iy0:iy1, ix0:ix1] = np.array(areas, dtype = float)/pixel**2
+    return image
+
+def thermal_coupling(componentIn,
+                     pixelSize = 1e0, # um
+                     kThermal = K_OXIDE,
+                     boxThickness = LayerStackParameters.box_thickness,
+                     cladThickness = LayerStackParameters.thickness_clad,
+                     wgThickness = LayerStackParameters.thickness_wg,
+                     wgCapture = 2e0, # um, lateral reach of a heater over its waveguide
+                     kernelRange = 10, # kernel cutoff, in units of heater height
+                     numImages = 200, # image pairs near the source
+                     numModes = 64, # slab modes further out
+                     batchSize = 16,
+                     heaterLayer = LAYERS.HEATER,
+                     wgLayer = LAYERS.WG):
+    # pairwise heater-to-waveguide thermal coupling of every HEATER polygon in componentIn.
+    # returns (centers, M): centers[i] is the (x, y) center of heater i, sorted by x then y,
+    # and M[i, j] is the average temperature rise (K) of the waveguide under heater j per
+    # W dissipated (uniformly per area) in heater i.
+    # model: heaters on top of the cladding, oxide everywhere between them and the
+    # substrate, substrate as an ideal heat sink. each heater's raster is convolved with
+    # the analytic point response at waveguide height, all heaters batched through one FFT
+    dbu = componentIn.kcl.layout.dbu
+    heater = gf.kdb.Region(componentIn.begin_shapes_rec(layer_index(heaterLayer, componentIn)))
+    heater.merge()
+    wg = gf.kdb.Region(componentIn.begin_shapes_rec(layer_index(wgLayer, componentIn)))
+    heaters = sorted(heater.each(), key = lambda p: (p.bbox().center().x, p.bbox().center().y))
+    numHeaters = len(heaters)
+    if numHeaters == 0:
+        return np.zeros((0, 2)), np.zeros((0, 0))
+
+    zHeater = boxThickness + cladThickness
+    zWg = boxThickness + wgThickness/2
+    pixel = int(round(pixelSize/dbu))
+    bbox = heater.bbox().enlarged(int(round(wgCapture/dbu)) + pixel)
+    origin = (bbox.left, bbox.bottom)
+    shape = (-(-bbox.height()//pixel), -(-bbox.width()//pixel))
+
+    # one power map (normalized to 1 W) and one waveguide mask per heater
+    powers = np.zeros((numHeaters,) + shape)
+    masks = np.zeros((numHeaters,) + shape)
+    capture = int(round(wgCapture/dbu))
+    for idx, thisHeater in enumerate(heaters):
+        heaterRegion = gf.kdb.Region(thisHeater)
+        powers[idx] = _rasterize(heaterRegion, origin, pixel, shape)
+        powers[idx] /= powers[idx].sum()
+        masks[idx] = _rasterize(wg & heaterRegion.sized(capture), origin, pixel, shape)
+        if masks[idx].sum() == 0:
+            print(f"Warning: no waveguide under heater {idx}, its column of M is zero")
+        else:
+            masks[idx] /= masks[idx].sum()
+
+    # kernel on the pixel grid, out to kernelRange heater heights (it decays as exp(-pi*rho/(2*zHeater)))
+    radius = min(int(np.ceil(kernelRange*zHeater/pixelSize)), max(shape))
+    offsets = pixelSize*np.arange(-radius, radius + 1)
+    kernel = _point_kernel(np.hypot(*np.meshgrid(offsets, offsets)), zWg, zHeater,
+                           kThermal, numImages, numModes)
+    fftShape = [scipy.fft.next_fast_len(n + 2*radius, real = True) for n in shape]
+    kernelFft = scipy.fft.rfft2(kernel, s = fftShape)
+
+    coupling = np.zeros((numHeaters, numHeaters))
+    maskMatrix = masks.reshape(numHeaters, -1).T
+    for start in range(0, numHeaters, batchSize):
+        stop = min(start + batchSize, numHeaters)
+        temps = scipy.fft.irfft2(scipy.fft.rfft2(powers[start:stop], s = fftShape, workers = -1)*kernelFft,
+                                 s = fftShape, workers = -1)
+        temps = temps[:, radius:radius + shape[0], radius:radius + shape[1]]
+        coupling[start:stop] = temps.reshape(stop - start, -1) @ maskMatrix
+
+    centers = np.array([(dbu*p.bbox().center().x, dbu*p.bbox().center().y) for p in heaters])
+    return centers, coupling
+
+def crosstalk_ratios(coupling):
+    # fraction of each heater's own waveguide heating that reaches its neighbours,
+    # R[i, j] = M[i, j]/M[i, i]
+    return coupling/np.diag(coupling)[:, None]
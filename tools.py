@@ -3,7 +3,7 @@ import gdsfactory as gf
 import uno_layout.components_wg as uno_wg
 import numpy as np
 
-from uno_layout import Settings, LayerMapUNO, waveguide_xs
+from uno_layout import Settings, LayerMapUNO, waveguide_xs, layer_index
 LAYERS = LayerMapUNO
 DEFAULT_WG_WIDTH = Settings.DEFAULT_WG_WIDTH
 DEFAULT_RADIUS = Settings.DEFAULT_RADIUS
@@ -27,17 +27,180 @@ def count_optical_ports(componentIn):
             count += 1
     return count
 
+def _tiling_processor(componentIn, tileSize = None, tileBorder = 0, threads = None):
+    # klayout tiling processor over componentIn: the queued script runs on each
+    # tileSize x tileSize (um) tile in parallel, seeing shapes up to tileBorder
+    # (um) outside the tile, so memory is bounded by the tile and not the die
+    tileSize = Settings.DEFAULT_TILE_SIZE if tileSize is None else tileSize
+    threads = Settings.DEFAULT_THREADS if threads is None else threads
+    tp = gf.kdb.TilingProcessor()
+    tp.dbu = componentIn.kcl.layout.dbu
+    tp.tile_size(tileSize, tileSize)
+    tp.tile_border(tileBorder, tileBorder)
+    tp.threads = threads
+    return tp
+
+def _add_biased_layers(c, componentIn, biasTable, tileSize = None, threads = None):
+    # biasTable maps layer -> total change in line width (um), like offsetDistance
+    # note the biased layers come out flat on the top cell (sizing per cell would merge
+    # wrongly where instances touch or overlap), so their whole output region is held in
+    # memory; every other layer keeps its hierarchy
+    layout = componentIn.kcl.layout
+    layers = list(biasTable)
+    layerIdx = [layer_index(layer, componentIn) for layer in layers]
+    # tile border has to cover the largest sizing so shapes near the tile edge are correct
+    maxBias = max(abs(thisBias) for thisBias in biasTable.values())
+    tp = _tiling_processor(componentIn, tileSize, maxBias, threads)
+    biased = []
+    script = []
+    for idx, thisLayer in enumerate(layers):
+        biased.append(gf.kdb.Region())
+        tp.input(f"in{idx}", componentIn.begin_shapes_rec(layerIdx[idx]))
+        tp.output(f"out{idx}", biased[idx])
+        # do bias/2 because we're offsetting on both sides of each shape
+        tp.var(f"b{idx}", round(biasTable[thisLayer]/2/layout.dbu))
+        # _tile is nil when everything fits in one tile
+        script.append(f"_output(out{idx}, _tile ? (in{idx}.sized(b{idx}) & _tile) : in{idx}.sized(b{idx}))")
+    # all layers are sized in the same pass over the tiles
+    tp.queue("; ".join(script))
+    tp.execute("uno_layout bias")
+    
+    # copy the hierarchy so we never touch the (cached) input cells, then
+    # swap the biased layers for their flat, tiled result
+    c.copy_tree(componentIn._kdb_cell)
+    for cellIdx in [c.cell_index()] + list(c.called_cells()):
+        for thisIdx in layerIdx:
+            layout.cell(cellIdx).shapes(thisIdx).clear()
+    for thisIdx, thisRegion in zip(layerIdx, biased):
+        thisRegion.merge()
+        c.shapes(thisIdx).insert(thisRegion)
+    c.add_ports(componentIn.ports)
+    return c
+
+@gf.cell
+def offset_waveguide(componentIn, offsetDistance, tileSize = None, threads = None):
+    # take a component and offset *just the waveguide layer*, flattened onto the top cell
+    c = gf.Component()
+    return _add_biased_layers(c, componentIn, {LAYERS.WG: offsetDistance}, tileSize, threads)
+
+def bias_layers(componentIn, 
+                biasTable, # {layer: total width change in um}, e.g. e-beam proximity bias
+                tileSize = None, # um, defaults to Settings.DEFAULT_TILE_SIZE
+                threads = None): # defaults to Settings.DEFAULT_THREADS
+    # same as offset_waveguide but for any number of layers in one tiled pass, e.g.
+    # bias_layers(die, {LAYERS.WG: 0.02, LAYERS.LABEL: 0.05, LAYERS.HEATER: 0.1})
+    # gf.cell can't serialize dicts with layer keys, so the table is passed on as pairs
+    return biased_layers(componentIn, tuple(biasTable.items()), tileSize, threads)
+
+@gf.cell
+def biased_layers(componentIn, biasPairs, tileSize = None, threads = None):
+    # bias_layers with the table as ((layer, bias), ...)
+    c = gf.Component()
+    return _add_biased_layers(c, componentIn, dict(biasPairs), tileSize, threads)
+    
+# default keep-out distances (um) for dummy fill, per layer
+DEFAULT_FILL_KEEPOUT = {
+    LAYERS.WG: 3e0,
+    LAYERS.HEATER: 5e0,
+    LAYERS.BOSCH: 20e0,
+    LAYERS.ANT_EDGE_TRENCH: 20e0,
+    LAYERS.ANT_HANDLING: 20e0,
+    LAYERS.ANT_THERMAL_TRENCH: 20e0,
+}
+
+class _TileCollector(gf.kdb.TileOutputReceiver):
+    # keeps whatever the tiling processor outputs for each tile, keyed by tile index.
+    # klayout destroys obj after put returns, so regions are copied
+    def __init__(self):
+        self.tiles = {}
+
+    def put(self, ix, iy, tile, obj, dbu, clip):
+        self.tiles[(ix, iy)] = (tile, obj.dup() if isinstance(obj, gf.kdb.Region) else obj)
+
 @gf.cell
-def offset_waveguide(componentIn, offsetDistance):
-    # take a component and offset *just the waveguide layer*
-    waveguideOnly = componentIn.extract([LAYERS.WG])
-    noWaveguide = componentIn.remove_layers([LAYERS.WG])
+def fill_post(size = 2e0, layer = LAYERS.WG):
+    # square dummy fill shape, centered
     c = gf.Component()
-    c << noWaveguide
-    # do offsetDistance/2 because we're offsetting on both sides of wg
-    c << waveguideOnly.offset(offsetDistance/2, layer = LAYERS.WG)
+    c << gf.components.rectangle(size = (size, size), layer = layer, centered = True)
     return c
+
+@gf.cell
+def density_fill(componentIn,
+                 targetDensity = 0.3, # target fill layer density per tile
+                 fillSize = 2e0, # um, side of square fill posts
+                 minSpacing = 2e0, # um, min edge-to-edge spacing of fill posts
+                 keepOut = None, # {layer: distance in um}, defaults to DEFAULT_FILL_KEEPOUT
+                 fillLayer = LAYERS.WG,
+                 areaLayer = LAYERS.FLOORPLAN, # only fill inside this layer (whole bbox if empty)
+                 tileSize = 100e0, # um, density is evaluated per tile
+                 threads = None): # defaults to Settings.DEFAULT_THREADS
+    # componentIn plus dummy fill on fillLayer wherever the local (per tile) density is
+    # below targetDensity. density and the allowed fill area (area layer minus sized
+    # keep-outs) are found per tile in one parallel tiling processor pass; each tile then
+    # gets a square grid of posts whose pitch makes up its density deficit, and all tiles
+    # sharing a pitch are filled with one fill_region call
+    c = gf.Component()
+    c << componentIn
+    keepOut = DEFAULT_FILL_KEEPOUT if keepOut is None else keepOut
+    dbu = componentIn.kcl.layout.dbu
+    maxKeepOut = max(list(keepOut.values()) + [0e0])
+    tp = _tiling_processor(componentIn, tileSize, maxKeepOut, threads)
+    # tiles overhang the layout, so density is taken over the part inside the frame.
+    # _tile is nil when everything fits in one tile, the frame stands in for it then
+    frame = componentIn.bbox()
+    tp.frame = componentIn.dbbox()
+    
+    tp.input("fill", componentIn.begin_shapes_rec(layer_index(fillLayer, componentIn)))
+    keepOutTerms = []
+    for idx, (thisLayer, thisDistance) in enumerate(keepOut.items()):
+        tp.input(f"ko{idx}", componentIn.begin_shapes_rec(layer_index(thisLayer, componentIn)))
+        tp.var(f"d{idx}", round(thisDistance/dbu))
+        keepOutTerms.append(f"ko{idx}.sized(d{idx})")
+    areaRegion = gf.kdb.Region(componentIn.begin_shapes_rec(layer_index(areaLayer, componentIn)))
+    if areaRegion.is_empty():
+        area = "tile"
+    else:
+        tp.input("area", componentIn.begin_shapes_rec(layer_index(areaLayer, componentIn)))
+        area = "(area & tile)"
+    densities = _TileCollector()
+    allowed = _TileCollector()
+    tp.output("density", densities)
+    tp.output("allowed", allowed)
+    keepOutExpr = " + ".join(keepOutTerms) if len(keepOutTerms) > 0 else "fill.sized(0)"
+    tp.queue(f"var tile = _tile ? (_tile & _frame) : _frame; "
+             f"_output(density, to_f((fill & tile).area) / to_f(tile.area)); "
+             f"_output(allowed, {area} - ({keepOutExpr}))")
+    tp.execute("uno_layout density fill")
+    
+    # pitch per tile from its density deficit, on a grid of fillSize/4 steps
+    minPitch = fillSize + minSpacing
+    pitchStep = fillSize/4
+    byPitch = {}
+    for key, (tile, density) in densities.tiles.items():
+        if key not in allowed.tiles or density >= targetDensity:
+            continue
+        tileAllowed = allowed.tiles[key][1]
+        tileArea = (tile & frame).area()
+        allowedFraction = tileAllowed.area()/tileArea if tileArea > 0 else 0
+        if allowedFraction <= 0:
+            continue
+        fillFraction = min((targetDensity - density)/allowedFraction, (fillSize/minPitch)**2)
+        pitch = max(pitchStep*np.round(fillSize/np.sqrt(fillFraction)/pitchStep), minPitch)
+        if pitch > tileSize/2:
+            continue
+        byPitch.setdefault(pitch, gf.kdb.Region()).insert(tileAllowed)
     
+    post = fill_post(fillSize, fillLayer)
+    for pitch, region in sorted(byPitch.items()):
+        step = round(pitch/dbu)
+        half = step//2
+        region.merge()
+        c.fill_region(region, post.cell_index(), gf.kdb.Box(-half, -half, step - half, step - half),
+                      gf.kdb.Vector(step, 0), gf.kdb.Vector(0, step), gf.kdb.Point(0, 0))
+    c.info["fill_pitches"] = sorted(float(p) for p in byPitch)
+    c.add_ports(componentIn.ports)
+    return c
+
 # TODO generic n-port
 
 @gf.cell
@@ -82,11 +245,11 @@ def generic_2port(dutComponent: gf.Component,
         totalLength = dut.info["length"] + inRoute.length + outRoute.length
         c.info["length"] = totalLength
         c.name = f"{totalLength:.0f}umDelay"
-        c << gf.components.text(text = f"{1e0*wgWidth:.0f}nm/{1e-4*totalLength:.2f}cm", 
-                                layer = LAYERS.ANNOTATION,
-                                position = (dut.dcenter.x, dut.dcenter.y),
-                                justify = "center",
-                                size = 25e0)
+        uno_wg.add_label(c, f"{1e0*wgWidth:.0f}nm/{1e-4*totalLength:.2f}cm", 
+                         layer = LAYERS.ANNOTATION,
+                         position = (dut.dcenter.x, dut.dcenter.y),
+                         justify = "center",
+                         size = 25e0)
     return c
 
 @gf.cell
@@ -157,6 +320,128 @@ def generic_3port(dutComponent: gf.Component, # see generic_2port for variable d
     c.with_uuid = True
     return c
 
+@gf.cell
+def rotated(componentIn, angle = 90):
+    # componentIn rotated about its origin, with ports. lets rotated components
+    # (e.g. the output edge couplers) be placed as regular array references
+    c = gf.Component()
+    r = c << componentIn
+    r.drotate(angle)
+    c.add_ports(r.ports)
+    return c
+
+def array_ports(arrayRef, portName):
+    # port portName of every element of an array reference, in array order
+    if not arrayRef.is_regular_array():
+        return [arrayRef.ports[portName]]
+    return [arrayRef.ports[portName, ia, ib] 
+            for ib in range(arrayRef.nb) for ia in range(arrayRef.na)]
+
+def route_length(route):
+    # optical length (um) of a route, from the info["length"] of its straights/bends
+    # (route.length from gf.routing is in dbu and leaves out the bends)
+    return sum(inst.cell.info.get("length", 0e0) for inst in route.instances)
+
+@gf.cell
+def generic_2port_batch(dutComponents, # tuple of 2-port components (gf.cell needs it hashable)
+                        portMappings = None, # one (input, output) port tuple per DUT
+                        straight1 = 500e0, # x of the DUT column's left edge, the input fan-in lives left of it
+                        dxdy = (1000e0,1000e0), # x of first output coupler, y of first input coupler
+                        edgeSep = DEFAULT_EDGE_SEP, # shared edge coupler pitch, also the min gap between DUTs
+                        wgWidth = None,
+                        labelsIn = None, # one input label per DUT
+                        labelsOut = None, # one output label per DUT
+                        doLength = True,
+                        tipWidth = None,
+                        boschWidth = uno_wg.DEFAULT_BOSCH_WIDTH):
+    # same structure as generic_2port, nested once per DUT: the DUTs are stacked by their
+    # bounding boxes (each input port on its coupler's height when there is room, pushed up
+    # otherwise) with their left edges at straight1. the input couplers on the left edge and
+    # the output couplers on the bottom edge keep the shared pitch, and each bank is routed
+    # to the DUTs with one route_bundle (fanning in left of the DUT column). input and output
+    # ports have to be on opposite sides (DUTs are turned so the input faces west). 3-port
+    # DUTs (generic_3port, edge_coupler_tri) aren't batched yet
+    c = gf.Component()
+    numDuts = len(dutComponents)
+    portMappings = [("o1", "o2")]*numDuts if portMappings is None else portMappings
+    crossSection = waveguide_xs(wgWidth)
+    
+    # edge coupler banks are built once, as array references at the shared pitch
+    coupler = uno_wg.edge_coupler(tipWidth, wgWidth, straightLength = boschWidth/2)
+    inBank = c.add_ref(coupler, columns = 1, rows = numDuts, spacing = (0, edgeSep))
+    inBank.dmove(coupler.ports["o1"].dcenter, (0, dxdy[1]))
+    outCoupler = rotated(coupler, 90)
+    outBank = c.add_ref(outCoupler, columns = numDuts, rows = 1, spacing = (edgeSep, 0))
+    outBank.dmove(outCoupler.ports["o1"].dcenter, (dxdy[0], 0))
+    inPorts = array_ports(inBank, "o2")
+    outPorts = array_ports(outBank, "o2")
+    
+    # stack the DUTs by their bounding boxes, never closer than edgeSep
+    duts = []
+    top = None
+    for dutIdx, dutComponent in enumerate(dutComponents):
+        dut = c << dutComponent
+        # turn the DUT so its input port faces the input couplers
+        if dut.ports[portMappings[dutIdx][0]].orientation != 180:
+            dut.drotate(180 - dut.ports[portMappings[dutIdx][0]].orientation)
+        inPort = dut.ports[portMappings[dutIdx][0]]
+        if dut.ports[portMappings[dutIdx][1]].orientation != 0:
+            raise Exception(f"DUT {dutIdx} needs its input and output ports on opposite sides!")
+        box = dut.dbbox()
+        portY = dxdy[1] + dutIdx*edgeSep
+        if top is not None:
+            portY = max(portY, top + edgeSep + inPort.dcenter[1] - box.bottom)
+        dut.dmove((box.left, inPort.dcenter[1]), (straight1, portY))
+        top = dut.dbbox().top
+        duts.append(dut)
+    
+    # the fan-ins have to turn between the couplers and the DUT column, and the output
+    # couplers have to sit right of every DUT so the nested routes don't cross
+    dutBoxes = [dut.bbox() for dut in duts]
+    endStraight = max(dut.ports[m[0]].dcenter[0] for dut, m in zip(duts, portMappings)) - straight1
+    if straight1 - endStraight < inPorts[0].dcenter[0] + 2*DEFAULT_RADIUS:
+        raise Exception("straight1 leaves no room to fan in to the DUTs!")
+    if max(dut.dbbox().right for dut in duts) + 2*DEFAULT_RADIUS > dxdy[0]:
+        raise Exception("DUTs are wider than dxdy[0] - straight1, move the output couplers right!")
+    
+    # route each coupler bank to all DUTs in one pass
+    inRoutes = gf.routing.route_bundle(c, inPorts, [dut.ports[m[0]] for dut, m in zip(duts, portMappings)],
+                                       end_straight_length = endStraight,
+                                       separation = 2*DEFAULT_RADIUS,
+                                       radius = DEFAULT_RADIUS,
+                                       cross_section = crossSection)
+    outRoutes = gf.routing.route_bundle(c, [dut.ports[m[1]] for dut, m in zip(duts, portMappings)], outPorts,
+                                        bboxes = dutBoxes,
+                                        separation = 2*DEFAULT_RADIUS,
+                                        radius = DEFAULT_RADIUS,
+                                        cross_section = crossSection)
+    
+    # total length of every structure in one step, DUTs without info["length"] count as 0
+    dutLengths = np.array([d.info.get("length", 0e0) for d in dutComponents])
+    routeLengths = np.array([[route_length(r) for r in pair] for pair in zip(inRoutes, outRoutes)])
+    totalLengths = dutLengths + routeLengths.sum(axis = 1)
+    c.info["lengths"] = totalLengths.tolist()
+    
+    for dutIdx in range(numDuts):
+        if labelsIn is not None and labelsIn[dutIdx] is not None:
+            uno_wg.add_label(c, labelsIn[dutIdx], size = DEFAULT_TEXT_SIZE, 
+                             position = (boschWidth, dxdy[1] + dutIdx*edgeSep + 15e0),
+                             layer = LAYERS.LABEL)
+        if labelsOut is not None and labelsOut[dutIdx] is not None:
+            uno_wg.add_label(c, labelsOut[dutIdx], size = DEFAULT_TEXT_SIZE,
+                             layer = LAYERS.LABEL,
+                             position = (dxdy[0] + dutIdx*edgeSep + 15e0, boschWidth),
+                             justify = "right",
+                             rotation = -90)
+        if doLength:
+            uno_wg.add_label(c, f"{1e-4*totalLengths[dutIdx]:.2f}cm", 
+                             layer = LAYERS.ANNOTATION,
+                             position = (duts[dutIdx].dcenter.x, duts[dutIdx].dcenter.y),
+                             justify = "center",
+                             size = 25e0)
+    c.with_uuid = True
+    return c
+
 def dp2tuple(this_point : gf.kdb.DPoint):
     return (this_point.x, this_point.y)
 